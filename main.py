@@ -1,20 +1,22 @@
 import logging
 import yaml
 from pandas import DataFrame
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 from rcm.core.cache import DateCache, DateRangeCache
 from rcm.core.config import paths, config
+from rcm.core.pipeline import Pipeline, Stage
 from rcm.extractors.reddit import RedditExtractor
 from rcm.extractors.yahoo import YahooFinanceExtractor
 from rcm.transformers.aggregation import AggregationTransformer
 from rcm.transformers.densify import DensifyTransformer
-from rcm.transformers.sentiment import SentimentTransformer
+from rcm.transformers.sentiment import SentimentTransformer, close_pool
 from rcm.utils.log_utils import initialize_logger
+from rcm.utils.profile_utils import get_report_path, profile
 log = logging.getLogger('rcm')
 
 
 
-def extract_yahoo() -> DataFrame:
+def extract_yahoo(data: Dict) -> DataFrame:
     """Extracts price history via Yahoo Finance."""
     return YahooFinanceExtractor().extract(
         symbols=config.extractors.yahoo.symbols,
@@ -22,27 +24,61 @@ def extract_yahoo() -> DataFrame:
     )
 
 
-def extract_reddit(endpoint: str) -> Dict[Tuple[str, str], List[DateCache]]:
-    """Extracts Reddit comments or submissions via Pushshift API."""
-    return {
-        query['search']: RedditExtractor().extract(**query)
-        for query in config.extractors.reddit.queries
-        if query['endpoint'] == endpoint
-    }
+def extract_reddit(query: Dict) -> Callable[[Dict], List[DateCache]]:
+    """Extracts Reddit comments or submissions for a single query via Pushshift API."""
+    return lambda data: RedditExtractor().extract(
+        endpoint=query['endpoint'],
+        search=query['search'],
+        min_score=query['min_score'],
+        min_date=query['min_date'],
+        max_date=query['max_date'],
+    )
+
+
+def transform_sentiment(query: Dict, transformer: SentimentTransformer) -> Callable[[Dict], DateRangeCache]:
+    """Performs sentiment analysis on a single query's Reddit data via the configured sentiment engines."""
+    return lambda data: transformer.transform(
+        endpoint=query['endpoint'],
+        search=query['search'],
+        min_score=query['min_score'],
+        caches=data[_get_key('reddit', query)],
+    )
+
+
+def gather_sentiment(queries: List[Dict]) -> Callable[[Dict], Dict[Tuple[str, str], DateRangeCache]]:
+    """Collects all queries' sentiment caches (of one endpoint), keyed by search."""
+    return lambda data: {query['search']: data[_get_key('sentiment', query)] for query in queries}
 
 
-def transform_sentiment(data: Dict, endpoint: str) -> Dict[Tuple[str, str], DateRangeCache]:
-    """Performs sentiment analysis on Reddit data via VaderSentiment and TextBlob."""
-    return {
-        query['search']: SentimentTransformer().transform(
-            endpoint=query['endpoint'],
-            search=query['search'],
-            min_score=query['min_score'],
-            caches=data[f'reddit_{endpoint}s'][query['search']],
-        )
-        for query in config.extractors.reddit.queries
-        if query['endpoint'] == endpoint
-    }
+def get_pipeline(transformer: SentimentTransformer) -> Pipeline:
+    """
+    Returns the whole pipeline, as a graph of stages.
+
+    Note:
+        Each Reddit query is extracted, and then transformed, as its own pair of stages, so a
+        query's sentiment analysis starts as soon as its own extraction finishes, while other
+        queries (and Yahoo) are still being extracted.  Aggregation waits for every query.
+    """
+    stages = [Stage('extract_yahoo', extract_yahoo, [], 'yahoo_finance_price_history')]
+    for endpoint in ['comment', 'submission']:
+        queries = [query for query in config.extractors.reddit.queries if query['endpoint'] == endpoint]
+        for query in queries:
+            stages += [
+                Stage(f'extract_{_get_key("reddit", query)}', extract_reddit(query), [], _get_key('reddit', query)),
+                Stage(f'transform_{_get_key("sentiment", query)}', transform_sentiment(query, transformer), [_get_key('reddit', query)], _get_key('sentiment', query)),
+            ]
+        stages += [Stage(f'gather_{endpoint}_sentiment', gather_sentiment(queries), [_get_key('sentiment', x) for x in queries], f'reddit_{endpoint}s_sentiment')]
+    stages += [
+        Stage('aggregate', lambda data: AggregationTransformer().transform(data), ['reddit_comments_sentiment', 'reddit_submissions_sentiment'], 'reddit_aggregations'),
+        Stage('densify', lambda data: DensifyTransformer().transform(data), ['yahoo_finance_price_history', 'reddit_aggregations'], 'features_dense'),
+    ]
+    return Pipeline(stages, config.pipeline.workers)
+
+
+def _get_key(kind: str, query: Dict) -> str:
+    """Returns the `data` key of a single query's extracted caches (`kind = reddit`) or sentiment cache (`kind = sentiment`)."""
+    suffix = '_sentiment' if kind == 'sentiment' else ''
+    return f'reddit_{query["endpoint"]}s{suffix}/{query["search"][0]}={query["search"][1]}'
 
 
 def main():
@@ -51,20 +87,20 @@ def main():
     log.info('Begin.')
     log.info(f'config = \n{yaml.dump(config._yaml, indent=4)}')
 
-    # Extract.
-    data = {}
-    data['yahoo_finance_price_history'] = extract_yahoo()
-    data['reddit_comments'] = extract_reddit('comment')
-    data['reddit_submissions'] = extract_reddit('submission')
-
-    # Transform.
-    data['reddit_comments_sentiment'] = transform_sentiment(data, 'comment')
-    data['reddit_submissions_sentiment'] = transform_sentiment(data, 'submission')
-    data['reddit_aggregations'] = AggregationTransformer().transform(data)
-    data['features_dense'] = DensifyTransformer().transform(data)
+    # Extract and transform.
+    # (All sentiment stages share one transformer, so that each distinct text is scored only once.)
+    transformer = SentimentTransformer()
+    try:
+        with profile('main'), transformer.deduplicating():
+            data = get_pipeline(transformer).run()
+    finally:
+        close_pool()
 
     # Log.
-    log.info('Done.')
+    log.info(f'Done with features = {len(data["features_dense"]):,} rows.')
+    if config.profile.enabled:
+        log.info(f'Profile written to:  {get_report_path()}.')
+    return data
 
 
 
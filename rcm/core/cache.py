@@ -1,10 +1,25 @@
+import functools
 import gzip
+import hashlib
 import json
 import logging
+import os
+import sqlite3
+import threading
+import time
 import pandas as pd
+import pyarrow
+import pyarrow.compute
+import pyarrow.dataset
+import pyarrow.parquet
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime, date
 from pandas import DataFrame
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+from rcm.core.config import config
+from rcm.utils.profile_utils import add_io
 log = logging.getLogger(__name__)
 
 
@@ -24,64 +39,215 @@ class DateCache:
         self.prefix: str = prefix
         self.suffix: str = suffix
         self.path: Path = prefix / f'year={date.strftime("%Y")}' / f'month={date.strftime("%m")}' / f'day={date.strftime("%d")}' / f'0{suffix}'
+        self.partial_path: Path = self.path.with_name('0.partial.jsonl.gz')
+        self.columnar_path: Path = self.path.with_name('0.snappy.parquet')
+        self.manifest: CacheManifest = CacheManifest(prefix)
 
-    def save(self, data: dict):
-        """Saves data to cache."""
+    def save(self, data: dict, rows: int = None):
+        """
+        Saves data to cache, and records it in the prefix's manifest.
+
+        Note:
+            The write is atomic.  Data is first written to a temporary file, which is then renamed
+            onto `self.path`.  Thus, a crash (or a concurrent reader) never observes a half-written
+            cache file.
+        """
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        with gzip.open(self.path, 'wt') as file:
+        temp_path = self.path.with_name(f'{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with gzip.open(temp_path, 'wt') as file:
             json.dump(data, file)
+        os.replace(temp_path, self.path)
+        self.manifest.record(self.path, self.date, self.date, len(data) if rows is None else rows)
+        add_io(rows_written=len(data) if rows is None else rows, bytes_written=self.path.stat().st_size)
 
     def load(self) -> dict:
         """Reads data from cache."""
+        add_io(bytes_read=self.path.stat().st_size)
         with gzip.open(self.path, 'rt') as file:
             return json.load(file)
 
+    def save_columnar(self, data: DataFrame):
+        """
+        Saves a compacted, columnar copy of the data, next to the original cache file.
+
+        Note:
+            The original cache file holds the complete, raw API responses, and remains the source of
+            truth.  The columnar copy holds only the columns consumers need, and is much cheaper to
+            read (no gzip or JSON decoding).
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.columnar_path.with_name(f'{self.columnar_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        data.to_parquet(temp_path, index=False)
+        os.replace(temp_path, self.columnar_path)
+        self.manifest.record(self.columnar_path, self.date, self.date, len(data))
+        add_io(rows_written=len(data), bytes_written=self.columnar_path.stat().st_size)
+
+    def load_columnar(self) -> DataFrame:
+        """Reads the compacted, columnar copy of the data."""
+        df = pd.read_parquet(self.columnar_path)
+        add_io(rows_read=len(df), bytes_read=self.columnar_path.stat().st_size)
+        return df
+
+    def append_partial(self, records: List[dict]):
+        """
+        Appends records to a partial checkpoint file, which sits next to the (not-yet-existing) cache
+        file.  Each record is written as one JSON line, and each call appends a new gzip member, so
+        previously-checkpointed records are never rewritten.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.partial_path, 'at') as file:
+            file.writelines(json.dumps(x) + '\n' for x in records)
+
+    def load_partial(self) -> List[dict]:
+        """
+        Reads all records from the partial checkpoint file (if any).
+
+        Note:
+            If the process crashed mid-append, the checkpoint may end with a truncated line or gzip
+            member.  In that case, we keep every record up to the damaged tail, and rewrite the
+            checkpoint without it, so that subsequent appends remain readable.
+        """
+        if not self.partial_path.is_file():
+            return []
+        records = []
+        try:
+            with gzip.open(self.partial_path, 'rt') as file:
+                for line in file:
+                    records += [json.loads(line)]
+        except (EOFError, OSError, json.JSONDecodeError) as e:
+            log.warning(f'Truncated checkpoint, keeping {len(records):,} records:  {self.partial_path}, {e.__class__.__name__}: {e}.')
+            temp_path = self.partial_path.with_name(f'{self.partial_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+            with gzip.open(temp_path, 'wt') as file:
+                file.writelines(json.dumps(x) + '\n' for x in records)
+            os.replace(temp_path, self.partial_path)
+        return records
+
+    def seal(self, data: dict, rows: int = None):
+        """Saves the complete data to cache, then deletes the partial checkpoint file."""
+        self.save(data, rows)
+        self.partial_path.unlink(missing_ok=True)
+
 
 
 class DateRangeCache:
-    """A cache file containing an arbitrary date range of timephased data."""
+    """
+    A cache containing an arbitrary date range of timephased data, stored as one or more part files.
+
+    Note:
+        Each `q` value is transformed and cached separately beneath its own prefix, into parquet
+        files named like:  `q={q}/min_date={min_date}, max_date={max_date}[, part={part}].snappy.parquet`,
+        where `min_date` and `max_date` indicate the date range within the file.  This file naming
+        pattern is used to optimize our incremental cache refresh logic.
+
+        Appending never rewrites existing data.  Instead, the inbound data is written as a new part
+        file, e.g. `part=3`, so a daily refresh costs O(new data), not O(all data).  Once a prefix
+        has more than `config.caches.max_parts` parts, they are merged in the background into a
+        single compacted file, e.g. `part=0-3`, which supersedes the parts it was built from.
+    """
 
     @classmethod
     def from_prefix(cls, prefix: Path, suffix: str = '.snappy.parquet') -> 'DateRangeCache':
+        """Finds the cache files at the given prefix, then instantiates an object that describes them."""
+        return cls.from_paths(prefix, prefix.glob('*' + suffix), suffix)
+
+    @classmethod
+    def from_paths(cls, prefix: Path, paths: Iterable[Path], suffix: str = '.snappy.parquet') -> 'DateRangeCache':
         """
-        Finds the cache file at the given prefix, then instantiates an object that describes it.
+        Instantiates an object describing the given cache files (all beneath one prefix).
 
         Note:
-            Each `q` value is transformed and cached separately into a parquet file named like:
-            `q={q}/min_date={min_date}, max_date={max_date}.snappy.parquet`, where `min_date` and
-            `max_date` indicate the date range within the parquet file.  This file naming pattern is
-            used to optimize our incremental cache refresh logic.
-        """
-        paths = list(prefix.glob('*' + suffix))
-        if len(paths) > 1:
-            raise Exception(f'Unexpected cache file count:  count = {len(paths)}, prefix = {prefix}.')
-        if len(paths) == 1:
-            min_date = datetime.strptime(paths[0].name[9:19], '%Y-%m-%d').date()
-            max_date = datetime.strptime(paths[0].name[30:40], '%Y-%m-%d').date()
-        else:
-            min_date = None
-            max_date = None
-        return cls(min_date, max_date, prefix, suffix)
+            If a compaction was interrupted after writing its output, but before deleting its inputs,
+            both exist on disk.  Parts superseded by a compacted file are ignored.
+        """
+        paths = sorted(paths, key=cls.path_to_parts)
+        ranges = [cls.path_to_parts(x) for x in paths]
+        parts = [
+            path
+            for path, (lo, hi) in zip(paths, ranges)
+            if not any(a <= lo and hi <= b and (a, b) != (lo, hi) for a, b in ranges)
+        ]
+        dates = [cls.path_to_dates(x) for x in parts]
+        min_date = min(x[0] for x in dates) if len(dates) > 0 else None
+        max_date = max(x[1] for x in dates) if len(dates) > 0 else None
+        return cls(min_date, max_date, prefix, suffix, parts)
+
+    @staticmethod
+    def path_to_dates(path: Path) -> Tuple[date, date]:
+        """Parses `min_date` and `max_date` from a cache file name."""
+        min_date = datetime.strptime(path.name[9:19], '%Y-%m-%d').date()
+        max_date = datetime.strptime(path.name[30:40], '%Y-%m-%d').date()
+        return min_date, max_date
 
-    def __init__(self, min_date: date, max_date: str, prefix: Path, suffix: str):
+    @staticmethod
+    def path_to_parts(path: Path) -> Tuple[int, int]:
+        """Parses the range of part numbers from a cache file name, e.g. `part=3` is `(3, 3)`, and `part=0-3` is `(0, 3)`."""
+        name = path.name.split('.')[0]
+        if ', part=' not in name:
+            return 0, 0
+        lo, _, hi = name.split(', part=')[1].partition('-')
+        return int(lo), int(hi or lo)
+
+    def __init__(self, min_date: date, max_date: str, prefix: Path, suffix: str, parts: List[Path] = None):
         self.min_date: date = min_date
         self.max_date: date = max_date
         self.prefix: Path = prefix
         self.suffix: str = suffix
-        self.path: Path = prefix / f'min_date={min_date}, max_date={max_date}{suffix}'
+        self.parts: List[Path] = parts if parts is not None else self._get_parts()
+        self.path: Path = self.parts[-1] if len(self.parts) > 0 else self._get_path(min_date, max_date, (0, 0))
+        self.manifest: CacheManifest = CacheManifest(prefix.parent)
 
     def save(self, data: DataFrame):
-        """Saves data to cache."""
+        """Saves data to cache, and records it in the parent prefix's manifest."""
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        data.to_parquet(self.path, index=False)
+        data.to_parquet(self.path, index=False, row_group_size=config.caches.row_group_rows)
+        self.manifest.record(self.path, self.min_date, self.max_date, len(data))
+        add_io(rows_written=len(data), bytes_written=self.path.stat().st_size)
 
-    def load(self) -> DataFrame:
-        """Reads data from cache."""
-        return pd.read_parquet(self.path)
+    def load(self, columns: List[str] = None, min_date: date = None, max_date: date = None, date_column: str = 'created_date') -> DataFrame:
+        """
+        Reads data from cache.  (If there are several parts, they are read as one dataset.)
+
+        Args:
+            columns (List[str]):
+                Columns to read.  If omitted, all columns are read.  Columns missing from every part
+                (e.g. a sentiment engine added since the cache was written) are returned as nulls.
+
+            min_date (date):
+                If given, only rows with `date_column >= min_date` are read.
+
+            max_date (date):
+                If given, only rows with `date_column < max_date + 1 day` are read.
+
+            date_column (str):
+                Column that `min_date` and `max_date` apply to.
+
+        Note:
+            Projections and filters are pushed down to the parquet reader.  Unread columns are never
+            decoded, and row groups whose date statistics fall outside the range are skipped entirely.
+            (Writers sort each part by date, so row groups cover narrow date ranges.)  Text columns
+            dominate the file size, so reading only the numeric columns is much cheaper.
+
+            The bytes read (for profiling) are the decoded Arrow bytes, so they reflect pushdown.
+        """
+        with _get_lock(self.prefix):
+            if not all(x.is_file() for x in self.parts):
+                self._refresh()
+            if len(self.parts) == 1 and columns is None and min_date is None and max_date is None:
+                table = pyarrow.parquet.read_table(self.path)
+            else:
+                schema = pyarrow.unify_schemas([pyarrow.parquet.read_schema(x) for x in self.parts])
+                dataset = pyarrow.dataset.dataset([str(x) for x in self.parts], schema=schema, format='parquet')
+                found = [x for x in columns if x in schema.names] if columns is not None else None
+                table = dataset.to_table(columns=found, filter=self._get_filter(schema, min_date, max_date, date_column))
+                for column in set(columns or []) - set(schema.names):
+                    table = table.append_column(column, pyarrow.nulls(table.num_rows))
+                table = table.select(columns) if columns is not None else table
+            add_io(rows_read=table.num_rows, bytes_read=table.nbytes)
+            return table.to_pandas()
 
     def append(self, new_data: DataFrame, date_column: str, min_date: date = None, max_date: date = None) -> DataFrame:
         """
-        Appends inbound data to existing cache file.  If no file exists, a new one is created.
+        Appends inbound data to the cache, as a new part file.  (Existing data is never read.)
 
         Args:
             new_data (DataFrame):
@@ -91,43 +257,404 @@ class DateRangeCache:
                 Dataframe column that `self.min_date` and `self.max_date` should be sourced from.
 
         Returns:
-            DataFrame:  Union of existing data and inbound data.
+            DataFrame:  Inbound data.
         """
+        with self.writer(date_column, min_date, max_date) as writer:
+            writer.write(new_data)
+        return new_data
 
-        # Does a previous cache already exist?  If so, we will append to it.
-        if self.path.is_file():
-            old_data = self.load()
-            new_data = pd.concat([old_data, new_data], ignore_index=True)
+    def overwrite(self, new_data: DataFrame, date_column: str, min_date: date = None, max_date: date = None) -> DataFrame:
 
-        # Get new date range.
-        old_path = self.path
-        self.min_date = new_data[date_column].min().date() if min_date is None else min_date
-        self.max_date = new_data[date_column].max().date() if max_date is None else max_date
-        self.path = self.prefix / f'min_date={self.min_date}, max_date={self.max_date}{self.suffix}'
+        with _get_lock(self.prefix):
 
-        # Create new cache file.
-        self.save(new_data)
-        log.debug(f'Cached {len(new_data):,} rows at:  {self.path.relative_to(self.prefix.parent).as_posix()}.')
+            # Does a previous cache already exist?  If so, we will delete all of its parts.
+            self._refresh()
+            for path in self.parts:
+                path.unlink()
+                self.manifest.remove(path)
 
-        # Delete old cache file.
-        if old_path.is_file():
-            old_path.unlink()
-            log.debug(f'Deleted {len(old_data):,} rows at:  {old_path.relative_to(self.prefix.parent).as_posix()}.')
+            # Get new date range.
+            self.min_date = new_data[date_column].min().date() if min_date is None else min_date
+            self.max_date = new_data[date_column].max().date() if max_date is None else max_date
+            self.path = self._get_path(self.min_date, self.max_date, (0, 0))
+            self.parts = [self.path]
 
-        return new_data
+            # Create new cache file.  (Sorted by date, so that date filters can skip row groups.)
+            self.save(new_data.sort_values(date_column, kind='stable'))
+            log.debug(f'Cached {len(new_data):,} rows at:  {self.path.relative_to(self.prefix.parent).as_posix()}.')
+            return new_data
 
-    def overwrite(self, new_data: DataFrame, date_column: str, min_date: date = None, max_date: date = None) -> DataFrame:
+    def writer(self, date_column: str, min_date: date = None, max_date: date = None) -> 'DateRangeWriter':
+        """
+        Returns a context manager that streams inbound data into a new part file, one dataframe at a
+        time, so that the inbound data is never held in memory all at once.
+
+        Example:
+            >>> with cache.writer('created_date') as writer:
+            ...     for df in chunks:
+            ...         writer.write(df)
+        """
+        return DateRangeWriter(self, date_column, min_date, max_date)
 
-        # Does a previous cache already exist?  If so, we will delete it.
-        if self.path.is_file():
-            self.path.unlink()
+    def compact(self):
+        """
+        Merges all parts into a single file, one row group at a time.  The merged file's schema is
+        the union of the parts' columns, e.g. when a sentiment cache written with all engines was
+        extended by a run with fewer engines.  Rows are padded with nulls for any columns they lack.
+        """
+        with _get_lock(self.prefix):
+            self._refresh()
+            if len(self.parts) <= 1:
+                return
+            parts = self.parts
+            path = self._get_path(self.min_date, self.max_date, (0, self.path_to_parts(parts[-1])[1]))
+            temp_path = path.with_name(f'_compacting.{os.getpid()}.{threading.get_ident()}.tmp')
+            schema = pyarrow.unify_schemas([pyarrow.parquet.read_schema(x) for x in parts])
+            rows = 0
+            with pyarrow.parquet.ParquetWriter(temp_path, schema) as writer:
+                for part in parts:
+                    for batch in pyarrow.parquet.ParquetFile(part).iter_batches(batch_size=config.caches.row_group_rows):
+                        writer.write_table(_conform(pyarrow.Table.from_batches([batch]), schema))
+                        rows += batch.num_rows
+            os.replace(temp_path, path)
+            self.manifest.record(path, self.min_date, self.max_date, rows)
+            for part in parts:
+                part.unlink()
+                self.manifest.remove(part)
+            self.parts = [path]
+            self.path = path
+            log.debug(f'Compacted {len(parts):,} parts ({rows:,} rows) into:  {path.relative_to(self.prefix.parent).as_posix()}.')
 
-        # Get new date range.
-        self.min_date = new_data[date_column].min().date() if min_date is None else min_date
-        self.max_date = new_data[date_column].max().date() if max_date is None else max_date
-        self.path = self.prefix / f'min_date={self.min_date}, max_date={self.max_date}{self.suffix}'
+    def compact_in_background(self) -> Future:
+        """Schedules `compact` on the (single) background compaction thread."""
+        return _compactor.submit(self.compact)
 
-        # Create new cache file.
-        self.save(new_data)
-        log.debug(f'Cached {len(new_data):,} rows at:  {self.path.relative_to(self.prefix.parent).as_posix()}.')
-        return new_data
+    def _get_filter(self, schema: pyarrow.Schema, min_date: date, max_date: date, date_column: str) -> pyarrow.dataset.Expression:
+        """Returns a dataset filter expression for given date range (or `None`, if unbounded)."""
+        if min_date is None and max_date is None:
+            return None
+        type = schema.field(date_column).type
+        tz = getattr(type, 'tz', None)
+        filters = []
+        if min_date is not None:
+            filters += [pyarrow.dataset.field(date_column) >= pyarrow.scalar(pd.Timestamp(min_date, tz=tz), type=type)]
+        if max_date is not None:
+            filters += [pyarrow.dataset.field(date_column) < pyarrow.scalar(pd.Timestamp(max_date, tz=tz) + pd.Timedelta(days=1), type=type)]
+        return functools.reduce(lambda x, y: x & y, filters)
+
+    def _get_parts(self) -> List[Path]:
+        return DateRangeCache.from_prefix(self.prefix, self.suffix).parts
+
+    def _get_path(self, min_date: date, max_date: date, parts: Tuple[int, int]) -> Path:
+        part = '' if parts == (0, 0) else f', part={parts[0]}' if parts[0] == parts[1] else f', part={parts[0]}-{parts[1]}'
+        return self.prefix / f'min_date={min_date}, max_date={max_date}{part}{self.suffix}'
+
+    def _refresh(self):
+        """Re-reads the parts from disk, e.g. after a compaction, or a write via another cache object."""
+        cache = DateRangeCache.from_prefix(self.prefix, self.suffix)
+        self.min_date, self.max_date, self.parts, self.path = cache.min_date, cache.max_date, cache.parts, cache.path
+
+
+
+class DateRangeWriter:
+    """
+    Streams dataframes into a new part file of a `DateRangeCache`, one parquet row group at a time.
+
+    Note:
+        Each dataframe is sorted by `date_column` and split into row groups of at most
+        `config.caches.row_group_rows` rows, so that readers can skip row groups by date.
+
+        Data is written to a temporary file.  When the writer is closed, the temporary file is
+        renamed to the next part's file name, which reflects the date range written.  If an
+        exception is raised, the temporary file is discarded, and the cache is left untouched.
+        If the cache then has more than `config.caches.max_parts` parts, it is compacted in the
+        background.
+    """
+
+    def __init__(self, cache: DateRangeCache, date_column: str, min_date: date = None, max_date: date = None):
+        self.cache: DateRangeCache = cache
+        self.date_column: str = date_column
+        self.min_date: date = min_date
+        self.max_date: date = max_date
+        self.temp_path: Path = cache.prefix / f'_writing.{os.getpid()}.{threading.get_ident()}.tmp'
+        self.writer: pyarrow.parquet.ParquetWriter = None
+        self.schema: pyarrow.Schema = None
+        self.rows: int = 0
+        self.data_min_date: date = None
+        self.data_max_date: date = None
+
+    def __enter__(self) -> 'DateRangeWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.writer is not None:
+            self.writer.close()
+        if exc_type is None and self.writer is not None:
+            self._commit()
+        else:
+            self.temp_path.unlink(missing_ok=True)
+
+    def write(self, data: DataFrame):
+        """Writes one dataframe to the cache.  (It can be released from memory afterward.)"""
+        table = pyarrow.Table.from_pandas(data, preserve_index=False)
+        if self.writer is None:
+            self.schema = table.schema
+            self.cache.prefix.mkdir(parents=True, exist_ok=True)
+            self.writer = pyarrow.parquet.ParquetWriter(self.temp_path, self.schema)
+        table = _conform(table, self.schema).sort_by(self.date_column)
+        self.writer.write_table(table, row_group_size=config.caches.row_group_rows)
+        self.rows += table.num_rows
+        dates = pyarrow.compute.min_max(table[self.date_column])
+        if dates['min'].is_valid:
+            min_date = pd.Timestamp(dates['min'].as_py()).date()
+            max_date = pd.Timestamp(dates['max'].as_py()).date()
+            self.data_min_date = min_date if self.data_min_date is None else min(self.data_min_date, min_date)
+            self.data_max_date = max_date if self.data_max_date is None else max(self.data_max_date, max_date)
+
+    def _commit(self):
+        cache = self.cache
+        min_date = self.data_min_date if self.min_date is None else self.min_date
+        max_date = self.data_max_date if self.max_date is None else self.max_date
+        if min_date is None:
+            self.temp_path.unlink()
+            return
+        with _get_lock(cache.prefix):
+            cache._refresh()
+            part = cache.path_to_parts(cache.parts[-1])[1] + 1 if len(cache.parts) > 0 else 0
+            path = cache._get_path(min_date, max_date, (part, part))
+            os.replace(self.temp_path, path)
+            cache.manifest.record(path, min_date, max_date, self.rows)
+            cache._refresh()
+        add_io(rows_written=self.rows, bytes_written=path.stat().st_size)
+        log.debug(f'Cached {self.rows:,} rows at:  {path.relative_to(cache.prefix.parent).as_posix()}.')
+        if len(cache.parts) > config.caches.max_parts:
+            cache.compact_in_background()
+
+
+
+class CacheManifest:
+    """
+    A small SQLite catalog, recording every cache file saved beneath a prefix.
+
+    Each entry records the file's relative path, date range, row count, byte size and checksum.
+    Consumers can then find (and prune) cache files by date range via the catalog, rather than
+    crawling the directory tree, which is slow for hundreds of thousands of day partitions.
+
+    Note:
+        `DateCache` objects are recorded in their own prefix's manifest, e.g. `word=btc/`.
+        `DateRangeCache` objects are recorded in their parent prefix's manifest, e.g.
+        `yahoo_finance_price_history/`, so that all symbols (or searches) share one catalog.
+
+        A manifest is created by the first save beneath its prefix, so on a cache tree written
+        before manifests existed, it initially lists only the newest files.  Thus, a manifest is
+        only trusted once it is `complete`, i.e. once `rebuild` has crawled the whole prefix.
+    """
+
+    def __init__(self, prefix: Path):
+        self.prefix: Path = prefix
+        self.path: Path = prefix / '_manifest.sqlite'
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def is_complete(self) -> bool:
+        """Returns true if the manifest has been rebuilt at least once, i.e. it lists every file beneath the prefix."""
+        if not self.exists():
+            return False
+        with closing(self._connect()) as connection:
+            return connection.execute("select count(*) from meta where key = 'complete'").fetchone()[0] > 0
+
+    def record(self, path: Path, min_date: date, max_date: date, rows: int):
+        """Adds (or replaces) the entry for given cache file."""
+        size, checksum = self._get_size_and_checksum(path)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                'insert or replace into entries values (?, ?, ?, ?, ?, ?, ?)',
+                (path.relative_to(self.prefix).as_posix(), str(min_date), str(max_date), rows, size, checksum, datetime.utcnow().isoformat()),
+            )
+
+    def remove(self, path: Path):
+        """Deletes the entry for given cache file."""
+        with closing(self._connect()) as connection, connection:
+            connection.execute('delete from entries where path = ?', (path.relative_to(self.prefix).as_posix(),))
+
+    def query(self, suffix: str = '', min_date: date = None, max_date: date = None) -> List[Dict]:
+        """Returns entries (ending with `suffix`) whose date range overlaps [min_date, max_date], ordered by date."""
+        if not self.exists():
+            return []
+        min_date = '0000-00-00' if min_date is None else str(min_date)
+        max_date = '9999-99-99' if max_date is None else str(max_date)
+        with closing(self._connect()) as connection:
+            cursor = connection.execute(
+                'select * from entries where path like ? and max_date >= ? and min_date <= ? order by min_date, path',
+                ('%' + suffix, min_date, max_date),
+            )
+            columns = [x[0] for x in cursor.description]
+            return [
+                {**dict(zip(columns, row)), 'min_date': date.fromisoformat(row[1]), 'max_date': date.fromisoformat(row[2])}
+                for row in cursor.fetchall()
+            ]
+
+    def rebuild(self, pattern: str, get_dates: Callable[[Path], Tuple[date, date]]):
+        """
+        Crawls the prefix once, records every file matching `pattern` (that isn't recorded already),
+        and marks the manifest complete.  (Used to backfill manifests for cache trees written
+        before manifests existed.  Row counts of backfilled files are unknown.)
+        """
+        log.info(f'Rebuilding manifest at:  {self.path}.')
+        recorded = {x['path'] for x in self.query()}
+        for path in self.prefix.rglob(pattern):
+            if path.relative_to(self.prefix).as_posix() not in recorded:
+                min_date, max_date = get_dates(path)
+                self.record(path, min_date, max_date, None)
+        with closing(self._connect()) as connection, connection:
+            connection.execute("insert or replace into meta values ('complete', ?)", (datetime.utcnow().isoformat(),))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.prefix.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute('pragma journal_mode=wal')
+        connection.execute(
+            'create table if not exists entries ('
+            'path text primary key, min_date text, max_date text, rows integer, bytes integer, checksum text, updated text)'
+        )
+        connection.execute('create table if not exists meta (key text primary key, value text)')
+        return connection
+
+    def _get_size_and_checksum(self, path: Path) -> Tuple[int, str]:
+        md5 = hashlib.md5()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 20), b''):
+                md5.update(block)
+        return path.stat().st_size, md5.hexdigest()
+
+
+
+class MemoCache:
+    """
+    A persistent, disk-backed memo store, mapping a text's hash to some (expensive) computed values.
+
+    Args:
+        path (Path):
+            SQLite file path.
+
+        namespace (str):
+            Describes what was computed, e.g. `vader+textblob`.  Values from different namespaces
+            never mix, so changing the computation only requires changing the namespace.
+
+        max_rows (int):
+            Once the store exceeds this many rows, the least-recently-used rows are evicted.
+
+    Note:
+        The same text is often scored many times, e.g. when it matches several searches, or when a
+        downstream cache is invalidated and rebuilt.  A memo lookup is far cheaper than re-scoring.
+
+        To keep lookups and inserts cheap on a large store, the row count is kept in a `meta`
+        table (rather than counted on every insert), and a row's last-used time is only refreshed
+        once it is more than `touch_seconds` old (rather than on every hit).  Thus, eviction order
+        is only approximately least-recently-used.
+    """
+
+    def __init__(self, path: Path, namespace: str, max_rows: int):
+        self.path: Path = path
+        self.namespace: str = namespace
+        self.max_rows: int = max_rows
+        self.touch_seconds: float = 86400
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def hash(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, tuple]:
+        """Returns memoized values for given keys.  (Missing keys are omitted.)"""
+        keys = list(keys)
+        found = {}
+        stale = []
+        now = time.time()
+        with closing(self._connect()) as connection, connection:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = connection.execute(
+                    f'select key, value, used from memo where namespace = ? and key in ({", ".join("?" * len(batch))})',
+                    [self.namespace, *batch],
+                ).fetchall()
+                found.update({key: tuple(json.loads(value)) for key, value, used in rows})
+                stale += [key for key, value, used in rows if used < now - self.touch_seconds]
+            if len(stale) > 0:
+                connection.executemany(
+                    'update memo set used = ? where namespace = ? and key = ?',
+                    [(now, self.namespace, key) for key in stale],
+                )
+        with self.lock:
+            self.stats['hits'] += len(found)
+            self.stats['misses'] += len(keys) - len(found)
+        return found
+
+    def put_many(self, values: Dict[str, tuple]):
+        """
+        Memoizes given values, then evicts least-recently-used rows (if over capacity).  (Keys that
+        are already memoized are left as is, since one namespace always computes the same value.)
+        """
+        with closing(self._connect()) as connection, connection:
+            self._count_rows(connection)
+            changes = connection.total_changes
+            connection.executemany(
+                'insert or ignore into memo values (?, ?, ?, ?)',
+                [(self.namespace, key, json.dumps(value), time.time()) for key, value in values.items()],
+            )
+            rows = self._add_rows(connection, connection.total_changes - changes)
+            if rows > self.max_rows:
+                evictions = rows - int(0.9 * self.max_rows)
+                connection.execute('delete from memo where rowid in (select rowid from memo order by used limit ?)', (evictions,))
+                self._add_rows(connection, -evictions)
+                with self.lock:
+                    self.stats['evictions'] += evictions
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups > 0 else 0
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=60)
+        connection.execute('pragma journal_mode=wal')
+        connection.execute('create table if not exists memo (namespace text, key text, value text, used real, primary key (namespace, key))')
+        connection.execute('create index if not exists memo_used on memo (used)')
+        connection.execute('create table if not exists meta (key text primary key, value integer)')
+        return connection
+
+    def _count_rows(self, connection: sqlite3.Connection):
+        """Counts the table once, if its row count has never been stored before."""
+        if connection.execute("select value from meta where key = 'rows'").fetchone() is None:
+            connection.execute("insert into meta select 'rows', count(*) from memo")
+
+    def _add_rows(self, connection: sqlite3.Connection, rows: int) -> int:
+        """Adds to the stored row count, and returns the new count."""
+        connection.execute("update meta set value = value + ? where key = 'rows'", (rows,))
+        return connection.execute("select value from meta where key = 'rows'").fetchone()[0]
+
+
+
+# One lock per cache prefix, serializing part commits, compactions and reads within this process.
+_locks: Dict[Path, threading.RLock] = {}
+_locks_lock: threading.Lock = threading.Lock()
+
+# Background compactions run one at a time, on a single thread.
+_compactor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='compactor')
+
+
+def _get_lock(prefix: Path) -> threading.RLock:
+    with _locks_lock:
+        return _locks.setdefault(Path(prefix).absolute(), threading.RLock())
+
+
+def _conform(table: pyarrow.Table, schema: pyarrow.Schema) -> pyarrow.Table:
+    """Casts a table to given schema, padding any missing columns with nulls."""
+    if table.schema.equals(schema, check_metadata=False):
+        return table
+    return pyarrow.Table.from_arrays(
+        [table[x.name].cast(x.type) if x.name in table.column_names else pyarrow.nulls(len(table), x.type) for x in schema],
+        schema=schema,
+    )
@@ -26,6 +26,10 @@ class Config:
         self.symbols: Dict[str, Symbol] = self._get_symbols()
         self.extractors: ExtractorConfig = ExtractorConfig(self)
         self.transformers: TransformerConfig = TransformerConfig(self)
+        self.caches: CacheConfig = CacheConfig(self)
+        self.dtypes: DtypeConfig = DtypeConfig(self)
+        self.pipeline: PipelineConfig = PipelineConfig(self)
+        self.profile: ProfileConfig = ProfileConfig(self)
 
     def _get_yaml(self) -> Dict:
         with open(paths.package / 'core' / 'config.yaml', 'r') as file:
@@ -50,6 +54,9 @@ class YahooExtractorConfig:
 
     def __init__(self, config: Config):
         self.symbols: List[str] = self._get_symbols(config)
+        self.overlap_days: int = config._yaml['extractors']['yahoo']['overlap_days']
+        self.full_refresh_days: int = config._yaml['extractors']['yahoo']['full_refresh_days']
+        self.workers: int = config._yaml['extractors']['yahoo']['workers']
 
     def _get_symbols(self, config: Config) -> List[str]:
         """Parses config file and returns list of in-scope Yahoo Finance symbols."""
@@ -66,6 +73,17 @@ class RedditExtractorConfig:
     def __init__(self, config: Config):
         self.min_date: date = datetime.strptime(config._yaml['extractors']['reddit']['min_date'], '%Y-%m-%d').date()
         self.max_date: date = datetime.strptime(config._yaml['extractors']['reddit']['max_date'], '%Y-%m-%d').date()
+        self.url: str = config._yaml['extractors']['reddit']['url']
+        self.workers: int = config._yaml['extractors']['reddit']['workers']
+        self.requests_per_second: float = config._yaml['extractors']['reddit']['requests_per_second']
+        self.checkpoint_pages: int = config._yaml['extractors']['reddit']['checkpoint_pages']
+        self.compact: bool = config._yaml['extractors']['reddit']['compact']
+        self.windows: int = config._yaml['extractors']['reddit']['windows']['count']
+        self.min_window_seconds: int = config._yaml['extractors']['reddit']['windows']['min_seconds']
+        self.window_workers: int = config._yaml['extractors']['reddit']['windows']['workers']
+        self.pool_size: int = config._yaml['extractors']['reddit']['http']['pool_size']
+        self.gzip: bool = config._yaml['extractors']['reddit']['http']['gzip']
+        self.max_sessions: int = config._yaml['extractors']['reddit']['http']['max_sessions']
         self.queries: List[Dict] = self._get_queries(config)
 
     def _get_queries(self, config: Config) -> List[Dict]:
@@ -94,6 +112,7 @@ class TransformerConfig:
 
     def __init__(self, config: Config):
         self.sentiment: SentimentTransformerConfig = SentimentTransformerConfig(config)
+        self.aggregation: AggregationTransformerConfig = AggregationTransformerConfig(config)
 
 
 
@@ -102,6 +121,10 @@ class SentimentTransformerConfig:
     def __init__(self, config: Config):
         self.chunk_size: int = config._yaml['transformers']['sentiment']['chunk_size']
         self.processes: int = self._get_processes(config)
+        self.engines: List[str] = config._yaml['transformers']['sentiment']['engines']
+        self.dedup: bool = config._yaml['transformers']['sentiment']['dedup']
+        self.memo: bool = config._yaml['transformers']['sentiment']['memo']['enabled']
+        self.memo_max_rows: int = config._yaml['transformers']['sentiment']['memo']['max_rows']
 
     def _get_processes(self, config: Config) -> int:
         processes = config._yaml['transformers']['sentiment']['processes']
@@ -111,5 +134,50 @@ class SentimentTransformerConfig:
             return processes
 
 
+
+class AggregationTransformerConfig:
+
+    def __init__(self, config: Config):
+        self.restatement_days: int = config._yaml['transformers']['aggregation']['restatement_days']
+        self.workers: int = self._get_workers(config)
+
+    def _get_workers(self, config: Config) -> int:
+        workers = config._yaml['transformers']['aggregation']['workers']
+        if workers == 'auto':
+            return mp.cpu_count()
+        else:
+            return workers
+
+
+
+class CacheConfig:
+
+    def __init__(self, config: Config):
+        self.max_parts: int = config._yaml['caches']['max_parts']
+        self.row_group_rows: int = config._yaml['caches']['row_group_rows']
+
+
+
+class DtypeConfig:
+
+    def __init__(self, config: Config):
+        self.compact: bool = config._yaml['dtypes']['compact']
+
+
+
+class PipelineConfig:
+
+    def __init__(self, config: Config):
+        self.workers: int = config._yaml['pipeline']['workers']
+
+
+
+class ProfileConfig:
+
+    def __init__(self, config: Config):
+        self.enabled: bool = config._yaml['profile']['enabled']
+        self.cprofile: bool = config._yaml['profile']['cprofile']
+
+
 paths = Paths()
 config = Config()
@@ -1,5 +1,8 @@
 from pandas import DataFrame
 from typing import Dict, List
+from rcm.core.config import config
+from rcm.utils.dtype_utils import compact_dtypes
+from rcm.utils.profile_utils import profile
 
 
 
@@ -11,6 +14,11 @@ class Extractor:
         All extractors should implement `extract` and `_read` methods.  The `extract` method should
         pull data from a (slow) remote source, and cache it to local disk.  The `_read` method
         should load previously-cached data into memory, and return it as a dataframe.
+
+        If `config.dtypes.compact` is set, the dataframe returned by `read` is converted to
+        memory-compact data types.  (See `compact_dtypes`.)  Cached data keeps its original types.
+
+        Every call is profiled.  (See `profile`.)
     """
 
     def __init__(self):
@@ -21,9 +29,15 @@ class Extractor:
         raise NotImplementedError
 
     def read(self, *args, **kwargs) -> DataFrame:
-        df = self._read(*args, **kwargs)
-        df = self._validate(df)
-        return df
+        with profile(f'{self.__class__.__name__}.read') as record:
+            df = self._read(*args, **kwargs)
+            df = self._validate(df)
+            if config.dtypes.compact and isinstance(df, DataFrame):
+                df = compact_dtypes(df, self.__class__.__name__)
+            if record is not None:
+                record.rows_in += sum(len(x) for x in [*args, *kwargs.values()] if isinstance(x, DataFrame))
+                record.rows_out = len(df) if isinstance(df, DataFrame) else None
+            return df
 
     def _read(self, *args, **kwargs) -> DataFrame:
         raise NotImplementedError
@@ -0,0 +1,144 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List
+from rcm.utils.profile_utils import profile, propagate
+log = logging.getLogger(__name__)
+
+
+
+class Stage:
+    """
+    A single pipeline step.
+
+    Args:
+        name (str):
+            Unique stage name, used for logging.
+
+        func (Callable):
+            Called as `func(data)`, where `data` holds (at least) all of `inputs`.  Its return
+            value is stored as `data[output]`.
+
+        inputs (List[str]):
+            Keys of `data` that must exist before this stage can start.
+
+        output (str):
+            Key of `data` this stage produces.
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict], Any], inputs: List[str], output: str):
+        self.name: str = name
+        self.func: Callable[[Dict], Any] = func
+        self.inputs: List[str] = inputs
+        self.output: str = output
+
+    def __repr__(self):
+        return self.name
+
+
+
+class Pipeline:
+    """
+    A lightweight task-graph runner.
+
+    Each stage declares the `data` keys it reads and the key it writes.  A stage starts as soon as
+    all of its inputs exist, so independent stages (e.g. Yahoo vs. Reddit extraction, or one query's
+    sentiment vs. another query's extraction) run concurrently, and total runtime approaches the
+    graph's critical path, rather than the sum of all stages.
+
+    Args:
+        stages (List[Stage]):
+            All stages.  Order doesn't matter.
+
+        workers (int):
+            Maximum number of stages running at once.
+
+    Note:
+        When more stages are ready than workers are free, the deepest stages start first, e.g. a
+        query's sentiment analysis starts before the next query's extraction.
+
+        Stages run in threads of this process.  (Stages doing CPU-heavy work already fan out to
+        their own process pools.)  If any stage fails, no further stages are started, running
+        stages are left to finish, and the first exception is re-raised.
+
+        Each stage is profiled as `stage.<name>`, within the caller's profile scopes (if any).
+    """
+
+    def __init__(self, stages: List[Stage], workers: int):
+        self.stages: List[Stage] = stages
+        self.workers: int = workers
+        self.timings: Dict[str, float] = {}
+        self.depths: Dict[str, int] = self._get_depths()
+
+    def run(self) -> Dict:
+        """Runs all stages, and returns the `data` dict, holding every stage's output."""
+        data = {}
+        pending = list(self.stages)
+        running: Dict[Future, Stage] = {}
+        error = None
+        log.info(f'Begin with stages = {len(self.stages):,}, workers = {self.workers}.')
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='stage') as executor:
+            while len(pending) > 0 or len(running) > 0:
+
+                # Start stages whose inputs are ready, while workers are free.  (Deepest stages first.)
+                if error is None:
+                    ready = sorted((x for x in pending if all(key in data for key in x.inputs)), key=lambda x: -self.depths[x.name])
+                    for stage in ready[:self.workers - len(running)]:
+                        pending.remove(stage)
+                        running[executor.submit(propagate(self._run_stage), stage, data)] = stage
+                if len(running) == 0:
+                    break
+
+                # Wait for any stage to finish, then store its output.
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    try:
+                        data[stage.output] = future.result()
+                    except Exception as e:
+                        log.error(f'Stage failed:  {stage}, {e.__class__.__name__}: {e}.')
+                        error = e if error is None else error
+
+        # Raise, or log and return.
+        if error is not None:
+            raise error
+        log.info(f'Done with timings = {self._format_timings()}.')
+        return data
+
+    def _run_stage(self, stage: Stage, data: Dict) -> Any:
+        log.debug(f'Begin stage:  {stage}.')
+        start_time = time.perf_counter()
+        with profile(f'stage.{stage.name}'):
+            result = stage.func(data)
+        self.timings[stage.name] = time.perf_counter() - start_time
+        log.debug(f'Done stage:  {stage}, elapsed = {self.timings[stage.name]:.2f} s.')
+        return result
+
+    def _get_depths(self) -> Dict[str, int]:
+        """
+        Returns each stage's depth, i.e. its number of upstream stages on the longest path.  Raises
+        an exception if stage names or outputs aren't unique, or if some input is never produced,
+        or if stages depend on each other cyclically.
+        """
+        names = [x.name for x in self.stages]
+        outputs = [x.output for x in self.stages]
+        if len(set(names)) != len(names) or len(set(outputs)) != len(outputs):
+            raise Exception('Stage names and outputs must be unique.')
+        missing = {key for x in self.stages for key in x.inputs} - set(outputs)
+        if len(missing) > 0:
+            raise Exception(f'Inputs not produced by any stage:  {sorted(missing)}.')
+        depths = {}
+        produced = {}
+        pending = list(self.stages)
+        while len(pending) > 0:
+            ready = [x for x in pending if all(key in produced for key in x.inputs)]
+            if len(ready) == 0:
+                raise Exception(f'Stages depend on each other cyclically:  {pending}.')
+            for stage in ready:
+                depths[stage.name] = max((produced[key] + 1 for key in stage.inputs), default=0)
+                produced[stage.output] = depths[stage.name]
+            pending = [x for x in pending if x not in ready]
+        return depths
+
+    def _format_timings(self) -> str:
+        return ', '.join(f'{name} = {seconds:.1f} s' for name, seconds in sorted(self.timings.items(), key=lambda x: -x[1])[:10])
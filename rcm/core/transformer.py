@@ -1,5 +1,8 @@
 from pandas import DataFrame
 from typing import Dict, List
+from rcm.core.config import config
+from rcm.utils.dtype_utils import compact_dtypes
+from rcm.utils.profile_utils import profile
 
 
 
@@ -9,6 +12,11 @@ class Transformer:
 
     Note:
         All transformers should implement the `_transform` method.
+
+        If `config.dtypes.compact` is set, a dataframe returned by `transform` is converted to
+        memory-compact data types.  (See `compact_dtypes`.)  Cached data keeps its original types.
+
+        Every call is profiled.  (See `profile`.)
     """
 
     def __init__(self):
@@ -17,9 +25,15 @@ class Transformer:
         self.not_null: List[str] = None
 
     def transform(self, *args, **kwargs) -> DataFrame:
-        df = self._transform(*args, **kwargs)
-        df = self._validate(df)
-        return df
+        with profile(f'{self.__class__.__name__}.transform') as record:
+            df = self._transform(*args, **kwargs)
+            df = self._validate(df)
+            if config.dtypes.compact and isinstance(df, DataFrame):
+                df = compact_dtypes(df, self.__class__.__name__)
+            if record is not None:
+                record.rows_in += sum(len(x) for x in [*args, *kwargs.values()] if isinstance(x, DataFrame))
+                record.rows_out = len(df) if isinstance(df, DataFrame) else None
+            return df
 
     def _transform(self, *args, **kwargs):
         raise NotImplementedError
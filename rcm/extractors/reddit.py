@@ -1,15 +1,23 @@
+import itertools
 import logging
 import pandas
+import threading
 from datetime import date, datetime, timedelta
 from pandas import DataFrame
 from pathlib import Path
 from typing import Dict, List, Tuple
-from rcm.core.cache import DateCache
-from rcm.core.config import paths
+from rcm.core.cache import CacheManifest, DateCache
+from rcm.core.config import paths, config
 from rcm.core.extractor import Extractor
+from rcm.utils.profile_utils import profiled
 from rcm.utils.date_utils import date_to_datetime, path_to_date
-from rcm.utils.request_utils import get_request
+from rcm.utils.rate_utils import TokenBucket
+from rcm.utils.request_utils import SessionPool, get_request
+from rcm.utils.retry_utils import retry_stats
+from rcm.utils.thread_utils import thread_map
 log = logging.getLogger(__name__)
+limiter = TokenBucket(config.extractors.reddit.requests_per_second)
+sessions = SessionPool(config.extractors.reddit.pool_size, config.extractors.reddit.gzip, config.extractors.reddit.max_sessions)
 
 
 
@@ -27,7 +35,8 @@ class RedditExtractor(Extractor):
         }
         self.unique_key: List[str] = ['id']
 
-    def extract(self, endpoint: str, search: Tuple[str, str], min_score: int, min_date: date, max_date: date, read: bool = False) -> List[DateCache]:
+    @profiled()
+    def extract(self, endpoint: str, search: Tuple[str, str], min_score: int, min_date: date, max_date: date, read: bool = False, workers: int = None) -> List[DateCache]:
         """
         Extracts (and caches) all comments (or submissions) posted within the given search filters.
 
@@ -49,6 +58,9 @@ class RedditExtractor(Extractor):
             read (bool):
                 If true, dataframe is returned instead of cache objects.
 
+            workers (int):
+                Number of days to extract concurrently.  Defaults to config value.
+
         Returns:
             List[DateCache]:  List of cache objects.
         """
@@ -61,18 +73,23 @@ class RedditExtractor(Extractor):
         max_date = min(max_date, date.today())
 
         # Extract (and cache) one day at a time.
-        caches = [
-            self._extract_and_cache_date(endpoint, search, min_score, min_date + timedelta(days=i))
-            for i in range((max_date - min_date).days + 1)
-        ]
+        caches = thread_map(
+            lambda x: self._extract_and_cache_date(endpoint, search, min_score, x),
+            self._get_dates(min_date, max_date),
+            workers if workers is not None else config.extractors.reddit.workers,
+        )
 
         # Log, return.
-        log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, min_date = {min_date}, max_date = {max_date}, caches = {len(caches):,}.')
+        log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, min_date = {min_date}, max_date = {max_date}, caches = {len(caches):,}, http = {sessions.stats()}, retries = {retry_stats()}.')
         if read:
             return self.read(endpoint, search, min_score, min_date, max_date, caches)
         else:
             return caches
 
+    def _get_dates(self, min_date: date, max_date: date) -> List[date]:
+        """Returns all dates within [min_date, max_date]."""
+        return [min_date + timedelta(days=i) for i in range((max_date - min_date).days + 1)]
+
     def _extract_and_cache_date(self, endpoint: str, search: Tuple[str, str], min_score: int, target_date: date) -> DateCache:
         """
         Extracts all comments (or submissions) posted on `target_date` within the given search filters.
@@ -80,22 +97,31 @@ class RedditExtractor(Extractor):
         Note:
             This function caches all API responses.  A separate local JSON file is created for every
             `(search, target_date)` combination.  If a given request is already cached, we skip the
-            API call.
+            API call.  While a day is in progress, its pages are checkpointed to a partial file, so
+            that a crash only loses the last few pages (rather than the whole day).
         """
 
         # Get cache object for upcoming request.
         cache = DateCache(target_date, self._get_cache_prefix(endpoint, search, min_score))
 
         # If result is not cached, hit the API and cache the result.
+        data = None
         if not cache.path.is_file():
-            data = self._extract_date(endpoint, search, min_score, date_to_datetime(target_date), date_to_datetime(target_date + timedelta(days=1)))
-            cache.save(data)
+            if config.extractors.reddit.windows > 1:
+                data = self._extract_date_adaptive(endpoint, search, min_score, date_to_datetime(target_date), date_to_datetime(target_date + timedelta(days=1)), cache)
+            else:
+                data = self._extract_date(endpoint, search, min_score, date_to_datetime(target_date), date_to_datetime(target_date + timedelta(days=1)), cache)
+            cache.seal(data, sum(x['response']['rows'] for x in data))
             log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, target_date = {target_date}, rows = {sum(x["response"]["rows"] for x in data):,}.')
 
+        # Compact sealed day into columnar format (if not done already).  (Freshly-extracted pages are still in memory.)
+        if config.extractors.reddit.compact and not cache.columnar_path.is_file():
+            self._compact(cache, data)
+
         # Return cache object.
         return cache
 
-    def _extract_date(self, endpoint: str, search: Tuple[str, str], min_score: int, min_time: datetime, max_time: datetime) -> List[dict]:
+    def _extract_date(self, endpoint: str, search: Tuple[str, str], min_score: int, min_time: datetime, max_time: datetime, checkpoint: DateCache = None) -> List[dict]:
         """
         Iteratively queries the Pushshift API, and returns all comments (or submissions) posted
         within the given search filters.
@@ -105,6 +131,15 @@ class RedditExtractor(Extractor):
             we must iteratively pull the data.  Each iteration, we slide our search window from
             left-to-right, until the entire interval has been searched.
 
+            Pushshift's `after` filter is exclusive, so if the next window started exactly at the
+            last page's maximum `created_utc`, any unseen rows posted within that same second would
+            be skipped.  Thus, consecutive windows overlap by one second, and rows already seen
+            (by `id`) are dropped from each new page.
+
+            If a `checkpoint` cache is given, every N pages are appended to its partial file.  On
+            restart, previously-checkpointed pages are reloaded, and we resume sliding from their
+            cursor, i.e. the maximum `created_utc` of the last checkpointed page.
+
         References:
             Pushshift API:
             https://github.com/pushshift/api
@@ -112,31 +147,33 @@ class RedditExtractor(Extractor):
         # TODO:  Be careful.  `timestamp` and `fromtimestamp` functions will assume local machine's timezone.
         # TODO:  On non-EST machine, will need to explicitly declare US/Eastern during all epoch conversions.
 
-        results = []
-        batch_min_time = min_time
+        results = checkpoint.load_partial() if checkpoint is not None else []
+        pending = []
+        seen = {x['id'] for result in results for x in result['response']['json']['data']}
+        batch_min_time = min_time if len(results) == 0 else datetime.fromtimestamp(max(x['created_utc'] for x in results[-1]['response']['json']['data'])) - timedelta(seconds=1)
         max_iterations = 1000
+        if len(results) > 0:
+            log.debug(f'Resuming from checkpoint with pages = {len(results):,}, cursor = {batch_min_time}.')
 
-        for i in range(max_iterations):
-
-            # Pull batch i.
-            params = {
-                'score': '>' + min_score if min_score else None,
-                'q': search[1] if search[0] == 'word' else None,
-                'subreddit': search[1] if search[0] == 'subreddit' else None,
-                'after': int(batch_min_time.timestamp()),
-                'before': int(max_time.timestamp()),
-                'size': 100,
-                'sort_type': 'created_utc',
-                'sort': 'asc',
-            }
-            params = {k: v for k, v in params.items() if v is not None}
-            result = get_request(f'https://api.pushshift.io/reddit/search/{endpoint}', params, i)
-            batch = result['response']['json']['data']
-
-            # If batch is empty, our query is complete.
+        for i in range(len(results), max_iterations):
+
+            # Pull batch i, and drop rows already seen in the previous (overlapping) batch.
+            result = self._get_page(endpoint, search, min_score, batch_min_time, max_time, i)
+            page = result['response']['json']['data']
+            batch = [x for x in page if x['id'] not in seen]
+
+            # If batch has no new rows, our query is complete.
+            # (Unless the page was full of rows posted within a single second.  Then, we can only skip past that second.)
             if len(batch) == 0:
+                if len(page) == result['request']['params']['size'] and datetime.fromtimestamp(page[-1]['created_utc']) > batch_min_time:
+                    log.warning(f'i = {i}, page is saturated by a single second, skipping ahead.')
+                    batch_min_time = datetime.fromtimestamp(page[-1]['created_utc'])
+                    continue
                 log.debug(f'i = {i}, batch = {len(batch)}, done.')
                 return results
+            result['response']['json']['data'] = batch
+            result['response']['rows'] = len(batch)
+            seen.update(x['id'] for x in batch)
 
             # Get minimum and maximum times in batch.
             batch_min_time = datetime.fromtimestamp(min([x['created_utc'] for x in batch]))
@@ -148,7 +185,12 @@ class RedditExtractor(Extractor):
             estimated_iterations = total_distance / distance_per_iteration
 
             # Add batch to results.
+            # Periodically checkpoint, so that a crash doesn't lose the entire day.
             results.append(result)
+            pending.append(result)
+            if checkpoint is not None and len(pending) >= config.extractors.reddit.checkpoint_pages:
+                checkpoint.append_partial(pending)
+                pending = []
             log.debug('i = {}, total = {:,}, batch = {:,}, date = {}, batch_min = {}, batch_max = {}, estimated = {:.2f}'.format(
                 i,
                 sum(x['response']['rows'] for x in results),
@@ -159,34 +201,142 @@ class RedditExtractor(Extractor):
                 estimated_iterations,
             ))
             i += 1
-            batch_min_time = batch_max_time
+            batch_min_time = batch_max_time - timedelta(seconds=1)
 
             # If maximum number iterations exceeded, stop early.
             if i == max_iterations - 1:
                 log.warning(f'i = {i}, max iterations exceeded.')
                 return results
 
+    def _extract_date_adaptive(self, endpoint: str, search: Tuple[str, str], min_score: int, min_time: datetime, max_time: datetime, checkpoint: DateCache = None) -> List[dict]:
+        """
+        Same as `_extract_date`, except the interval is split into equal sub-windows (e.g. hourly),
+        which are paginated concurrently.  Results are merged in `created_utc` order, so the output
+        is interchangeable with `_extract_date`.
+
+        Note:
+            Each sub-window is checkpointed as a whole, once all of its pages are collected.  On
+            restart, sub-windows already present in the checkpoint are skipped.
+
+            Pushshift's `after` and `before` filters are both exclusive, so rows posted exactly on a
+            boundary second would belong to neither neighbor.  Thus, adjacent sub-windows overlap by
+            one second, and duplicate rows (by `id`) are dropped when pages are merged.
+        """
+
+        # Split interval into sub-windows.
+        count = config.extractors.reddit.windows
+        step = (max_time - min_time) / count
+        windows = [(min_time + k * step, min_time + (k + 1) * step) for k in range(count)]
+
+        # Skip sub-windows that were already checkpointed.
+        results = [x for x in (checkpoint.load_partial() if checkpoint is not None else []) if 'window' in x['request']]
+        done = {tuple(x['request']['window']) for x in results}
+        windows = [x for x in windows if (x[0].timestamp(), x[1].timestamp()) not in done]
+        log.debug(f'Begin with windows = {count}, checkpointed = {count - len(windows)}, pages = {len(results):,}.')
+
+        # Extract sub-windows concurrently, and checkpoint each one when it's done.
+        lock = threading.Lock()
+        one_second = timedelta(seconds=1)
+        def _extract_and_checkpoint_window(window: Tuple[datetime, datetime]) -> List[dict]:
+            pages = self._extract_window(
+                endpoint, search, min_score,
+                window[0] - one_second if window[0] > min_time else window[0],
+                window[1] + one_second if window[1] < max_time else window[1],
+            )
+            for page in pages:
+                page['request']['window'] = [window[0].timestamp(), window[1].timestamp()]
+            if checkpoint is not None and len(pages) > 0:
+                with lock:
+                    checkpoint.append_partial(pages)
+            return pages
+        for pages in thread_map(_extract_and_checkpoint_window, windows, config.extractors.reddit.window_workers):
+            results += pages
+
+        # Merge pages in `created_utc` order, and drop duplicate rows from overlapping windows.
+        results = sorted(results, key=lambda x: min(y['created_utc'] for y in x['response']['json']['data']))
+        results = self._dedupe(results)
+        log.debug(f'Done with windows = {count}, pages = {len(results):,}, total = {sum(x["response"]["rows"] for x in results):,}.')
+        return results
+
+    def _extract_window(self, endpoint: str, search: Tuple[str, str], min_score: int, min_time: datetime, max_time: datetime) -> List[dict]:
+        """
+        Returns all (non-empty) pages posted within the given window.
+
+        Note:
+            If the first page comes back saturated (i.e. full), the rest of the window is split in
+            half, and both halves are searched concurrently (and recursively).  Once a window is
+            narrower than `min_window_seconds`, it is paginated sequentially instead.  Like the
+            sub-windows in `_extract_date_adaptive`, the rest of the window (and each half) overlaps
+            its neighbors by one second.  (Duplicates are dropped by the caller.)
+        """
+        result = self._get_page(endpoint, search, min_score, min_time, max_time, 0)
+        batch = result['response']['json']['data']
+        if len(batch) == 0:
+            return []
+        if len(batch) < result['request']['params']['size']:
+            return [result]
+        one_second = timedelta(seconds=1)
+        cursor = datetime.fromtimestamp(max(x['created_utc'] for x in batch)) - one_second
+        if (max_time - cursor).total_seconds() < 2 * config.extractors.reddit.min_window_seconds:
+            return [result] + self._extract_date(endpoint, search, min_score, cursor, max_time)
+        midpoint = cursor + (max_time - cursor) / 2
+        halves = thread_map(lambda x: self._extract_window(endpoint, search, min_score, x[0], x[1]), [(cursor, midpoint + one_second), (midpoint - one_second, max_time)], 2)
+        return [result] + halves[0] + halves[1]
+
+    def _dedupe(self, results: List[dict]) -> List[dict]:
+        """Drops rows already seen (by `id`) in an earlier page, then drops pages left empty."""
+        seen = set()
+        deduped = []
+        for result in results:
+            batch = [x for x in result['response']['json']['data'] if x['id'] not in seen]
+            seen.update(x['id'] for x in batch)
+            if len(batch) > 0:
+                result['response']['json']['data'] = batch
+                result['response']['rows'] = len(batch)
+                deduped.append(result)
+        return deduped
+
+    def _get_page(self, endpoint: str, search: Tuple[str, str], min_score: int, min_time: datetime, max_time: datetime, iteration: int) -> dict:
+        """Queries the Pushshift API once, and returns (at most) 100 comments (or submissions) posted after `min_time`."""
+        params = {
+            'score': '>' + min_score if min_score else None,
+            'q': search[1] if search[0] == 'word' else None,
+            'subreddit': search[1] if search[0] == 'subreddit' else None,
+            'after': int(min_time.timestamp()),
+            'before': int(max_time.timestamp()),
+            'size': 100,
+            'sort_type': 'created_utc',
+            'sort': 'asc',
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        return get_request(f'{config.extractors.reddit.url}/{endpoint}', params, iteration, limiter, sessions)
+
     def _read(self, endpoint: str, search: Tuple[str, str], min_score: int, min_date: date = None, max_date: date = None, caches: List[DateCache] = None) -> DataFrame:
         """Reads previously-cached data into a dataframe."""
 
         # Log.
         log.debug(f'Begin with endpoint = {endpoint}, {search[0]} = {search[1]}, min_date = {min_date}, max_date = {max_date}, caches = {0 if caches is None else len(caches)}.')
 
-        # If cache targets not provided, search for them.
+        # If cache targets not provided, search for them via the manifest.
+        # (If the manifest has never been rebuilt, e.g. the cache tree predates manifests, crawl it once to complete it.)
         if caches is None:
             prefix = self._get_cache_prefix(endpoint, search, min_score)
+            manifest = CacheManifest(prefix)
+            if not manifest.is_complete():
+                manifest.rebuild('*.json.gz', lambda x: (path_to_date(x), path_to_date(x)))
             caches = [
-                DateCache(path_to_date(x), prefix)
-                for x in prefix.rglob('*.json.gz')
-                if (min_date is None or path_to_date(x) >= min_date) and (max_date is None or path_to_date(x) <= max_date)
+                DateCache(x['min_date'], prefix)
+                for x in manifest.query('.json.gz', min_date, max_date)
             ]
 
-        # Read cached JSON responses into a dataframe.
-        frames = [
-            DataFrame(result['response']['json']['data'], columns=self.schema.keys())
-            for cache in caches
-            for result in cache.load()
-        ]
+        # Read compacted caches via their columnar copies, and read each run of other (raw JSON) caches into one dataframe.
+        # Runs are kept in `caches` order, so rows come back in the same order either way.
+        frames = []
+        for compacted, group in itertools.groupby(caches, key=lambda x: x.columnar_path.is_file()):
+            if compacted:
+                frames += [cache.load_columnar() for cache in group]
+            else:
+                frames += [self._to_frame([row for cache in group for result in cache.load() for row in result['response']['json']['data']])]
         if len(frames) > 0:
             df = pandas.concat(frames, ignore_index=True)
         else:
@@ -196,6 +346,16 @@ class RedditExtractor(Extractor):
         log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, min_date = {min_date}, max_date = {max_date}, caches = {len(caches)}, rows = {len(df):,}.')
         return df
 
+    def _compact(self, cache: DateCache, data: List[dict] = None):
+        """Converts a sealed day of raw API responses (read from cache, unless given) into a columnar file holding only `schema` columns."""
+        data = cache.load() if data is None else data
+        df = self._to_frame([row for result in data for row in result['response']['json']['data']])
+        cache.save_columnar(df)
+
+    def _to_frame(self, rows: List[dict]) -> DataFrame:
+        """Converts raw API rows into a dataframe with `schema` columns and data types."""
+        return DataFrame(rows, columns=self.schema.keys()).astype(self.schema)
+
     def _get_cache_prefix(self, endpoint: str, search: Tuple[str, str], min_score: int) -> Path:
         """Returns cache path prefix for given endpoint and search filter."""
         return (
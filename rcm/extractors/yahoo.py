@@ -1,12 +1,17 @@
+import itertools
 import logging
+import numpy
 import pandas
 import yfinance as yf
 from datetime import date, timedelta
 from pandas import DataFrame
+from pathlib import Path
 from typing import Dict, List
-from rcm.core.cache import DateRangeCache
-from rcm.core.config import paths
+from rcm.core.cache import CacheManifest, DateRangeCache
+from rcm.core.config import config, paths
 from rcm.core.extractor import Extractor
+from rcm.utils.profile_utils import profiled
+from rcm.utils.thread_utils import thread_map
 log = logging.getLogger(__name__)
 
 
@@ -29,7 +34,9 @@ class YahooFinanceExtractor(Extractor):
             'symbol',
             'date',
         ]
+        self.failures: Dict[str, str] = {}
 
+    @profiled()
     def extract(self, symbols: List[str], read: bool = False) -> List[DateRangeCache]:
         """
         Extracts (and caches) the daily price history for given list of symbols.
@@ -43,39 +50,125 @@ class YahooFinanceExtractor(Extractor):
 
         Returns:
             List[DateRangeCache]:  List of cache objects.
+
+        Note:
+            Symbols are extracted concurrently, across a pool of `config.extractors.yahoo.workers`
+            threads.  Each symbol is fetched and cached independently, so one symbol's failure
+            (e.g. a delisted ticker) is logged and recorded in `self.failures`, and the other
+            symbols carry on.  (Its previously-cached data, if any, is still read.)  If every
+            symbol fails, an exception is raised.
         """
-        caches = [self._extract_symbol(x) for x in symbols]
+        self.failures = {}
+        caches = thread_map(self._extract_symbol_isolated, symbols, config.extractors.yahoo.workers)
+        caches = [x for x in caches if x is not None]
+        if len(symbols) > 0 and len(self.failures) == len(symbols):
+            raise Exception(f'All symbols failed:  {self.failures}.')
+        log.debug(f'Done with symbols = {len(symbols):,}, failures = {len(self.failures):,}.')
         return caches if not read else self.read(symbols)
 
+    def _extract_symbol_isolated(self, symbol: str) -> DateRangeCache:
+        """Extracts a single symbol.  If it fails, logs and records the failure, then returns `None`."""
+        try:
+            return self._extract_symbol(symbol)
+        except Exception as e:
+            log.exception(f'Failed with symbol = {symbol}.')
+            self.failures[symbol] = f'{e.__class__.__name__}: {e}'
+            return None
+
     def _extract_symbol(self, symbol: str) -> DateRangeCache:
-        """Extracts (and caches) the daily price history for a single symbol."""
+        """
+        Extracts (and caches) the daily price history for a single symbol.
+
+        Note:
+            Normally, only the last few days are fetched, i.e. `[max_date - overlap_days, today)`,
+            and days after the cache's `max_date` are appended to it.  The overlapping days are
+            compared with the cache, since Yahoo restates past prices whenever it re-adjusts them.
+            The full history is re-downloaded (and the cache overwritten) if any of these hold:
+
+                1.  The cache is empty.
+                2.  The last full refresh is more than `full_refresh_days` old.
+                3.  A corporate action (dividend or stock split) occurred since the cache's `max_date`.
+                4.  Any overlapping day's close price differs from the cached one.
+        """
 
         # Get cache object.
         prefix = paths.data / 'yahoo_finance_price_history' / f'symbol={symbol}'
         cache = DateRangeCache.from_prefix(prefix)
+        today = date.today()
 
-        # If cache is empty or stale, hit the API, and cache the result.
+        # Stop early if the cache is up-to-date.
         # Never load current date (to prevent stale snapshot in cache).
-        if cache.max_date is None or cache.max_date < date.today() - timedelta(days=1):
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period='max')
-            df.insert(0, 'symbol', symbol)
-            df = df.reset_index()
-            df = df[df['Date'] < date.today().strftime('%Y-%m-%d')]
-            df = cache.overwrite(df, 'Date')
-            del df
-
+        if cache.max_date is not None and cache.max_date >= today - timedelta(days=1):
+            return cache
+
+        # Hit the API for the last few days only, if possible.
+        ticker = yf.Ticker(symbol)
+        reason = self._get_full_refresh_reason(cache, today)
+        if reason is None:
+            start = cache.max_date - timedelta(days=config.extractors.yahoo.overlap_days)
+            df = self._get_history(symbol, ticker, today, start=start)
+            reason = self._get_restatement_reason(cache, df)
+        if reason is None:
+            df = df[df['Date'].dt.date > cache.max_date]
+            cache.append(df, 'Date')
+            log.debug(f'Appended {len(df):,} rows with symbol = {symbol}, start = {start}.')
+            return cache
+
+        # Otherwise, hit the API for the full history, and overwrite the cache.
+        log.debug(f'Full refresh with symbol = {symbol}, reason = {reason}.')
+        df = self._get_history(symbol, ticker, today, period='max')
+        df = cache.overwrite(df, 'Date')
+        (prefix / '_refreshed').write_text(str(today))
+        del df
         return cache
 
+    def _get_history(self, symbol: str, ticker: yf.Ticker, today: date, **kwargs) -> DataFrame:
+        """Fetches daily price history (before today) via `ticker.history`."""
+        df = ticker.history(**({**kwargs, 'end': today} if 'start' in kwargs else kwargs))
+        df.insert(0, 'symbol', symbol)
+        df = df.reset_index()
+        return df[df['Date'].dt.date < today]
+
+    def _get_full_refresh_reason(self, cache: DateRangeCache, today: date) -> str:
+        """Returns why the full history must be re-downloaded, before fetching anything (or `None`, if it needn't be)."""
+        refreshed_path = cache.prefix / '_refreshed'
+        if cache.max_date is None:
+            return 'empty'
+        if not refreshed_path.is_file():
+            return 'never refreshed'
+        if date.fromisoformat(refreshed_path.read_text()) < today - timedelta(days=config.extractors.yahoo.full_refresh_days):
+            return 'schedule'
+        return None
+
+    def _get_restatement_reason(self, cache: DateRangeCache, df: DataFrame) -> str:
+        """Returns why recently-fetched prices invalidate the cached history (or `None`, if they don't)."""
+        if len(df) == 0:
+            return None
+        new = df[df['Date'].dt.date > cache.max_date]
+        if (new['Dividends'] != 0).any() or (new['Stock Splits'] != 0).any():
+            return 'corporate action'
+        df_cached = cache.load(columns=['Date', 'Close'], min_date=df['Date'].dt.date.min(), date_column='Date')
+        overlap = df.merge(df_cached, how='inner', on='Date', suffixes=('', '_cached'))
+        if not numpy.allclose(overlap['Close'], overlap['Close_cached'], rtol=1e-6, equal_nan=True):
+            return 'restated'
+        return None
+
     def _read(self, symbols: List[str] = None, caches: List[DateRangeCache] = None) -> DataFrame:
         """Reads previously-cached data into a dataframe."""
 
-        # If cache targets not provided, search for them.
+        # If cache targets not provided, search for them via the manifest.
+        # (If the manifest has never been rebuilt, e.g. the cache tree predates manifests, crawl it once to complete it.)
         if caches is None:
+            manifest = CacheManifest(paths.data / 'yahoo_finance_price_history')
+            if not manifest.is_complete():
+                manifest.rebuild('*.snappy.parquet', DateRangeCache.path_to_dates)
+            entries = sorted(
+                (x for x in manifest.query('.snappy.parquet') if symbols is None or Path(x['path']).parent.name[7:] in symbols),
+                key=lambda x: x['path'],
+            )
             caches = [
-                DateRangeCache.from_prefix(x.parent)
-                for x in (paths.data / 'yahoo_finance_price_history').rglob('*.snappy.parquet')
-                if symbols is None or x.parts[-2][7:] in symbols
+                DateRangeCache.from_paths(manifest.prefix / parent, [manifest.prefix / x['path'] for x in group])
+                for parent, group in itertools.groupby(entries, key=lambda x: Path(x['path']).parent)
             ]
 
         # Read cache objects into dataframe.
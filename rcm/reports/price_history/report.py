@@ -2,7 +2,7 @@ import logging
 from pandas import DataFrame
 from rcm.core.config import paths
 from rcm.utils.excel_utils import to_excel
-from rcm.utils.date_utils import epoch_to_est
+from rcm.utils.date_utils import epoch_to_est_date
 log = logging.getLogger(__name__)
 
 
@@ -13,7 +13,7 @@ def run(df_prices: DataFrame, df_comments: DataFrame) -> DataFrame:
     # Aggregate comments.
     df_comment_counts = (df_comments
         .copy()
-        .assign(created_date=lambda df: epoch_to_est(df['created_utc']).dt.floor('D'))
+        .assign(created_date=lambda df: epoch_to_est_date(df['created_utc']))
         .assign(num_comments=1)
         .groupby('created_date', as_index=False)[['num_comments', 'score']]
         .sum()
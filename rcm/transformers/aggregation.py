@@ -1,20 +1,27 @@
 import logging
+import multiprocessing as mp
 import pandas
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
 from pathlib import Path
-from pandas import DataFrame
+from pandas import DataFrame, Series
 from typing import Dict, List, Tuple
 from rcm.core.cache import DateRangeCache
 from rcm.core.config import paths, config
 from rcm.core.transformer import Transformer
+from rcm.transformers.engines import get_columns, get_engines
 from rcm.utils.pandas_utils import _insert
+from rcm.utils.profile_utils import absorb, collect
 log = logging.getLogger(__name__)
 
 
 
-# TODO:  Update cache incrementally.
 class AggregationTransformer(Transformer):
 
     def __init__(self):
+        self.columns: List[str] = get_columns(get_engines(config.transformers.sentiment.engines))
+        self.weighted: List[str] = [x for x in ['positive', 'negative', 'compound', 'polarity', 'subjectivity'] if x in self.columns]
         self.schema: Dict[str, str] = {
             'endpoint': 'string',
             'search': 'string',
@@ -27,16 +34,8 @@ class AggregationTransformer(Transformer):
             'wnum_rockets': 'int',
             'wnum_positive': 'int',
             'wnum_negative': 'int',
-            'wsum_positive': 'float',
-            'wsum_negative': 'float',
-            'wsum_compound': 'float',
-            'wsum_polarity': 'float',
-            'wsum_subjectivity': 'float',
-            'wavg_positive': 'float',
-            'wavg_negative': 'float',
-            'wavg_compound': 'float',
-            'wavg_polarity': 'float',
-            'wavg_subjectivity': 'float',
+            **{f'wsum_{x}': 'float' for x in self.weighted},
+            **{f'wavg_{x}': 'float' for x in self.weighted},
         }
         self.unique_key: List[str] = [
             'endpoint',
@@ -46,7 +45,20 @@ class AggregationTransformer(Transformer):
         self.not_null: List[str] = []
 
     def _transform(self, data: Dict) -> DataFrame:
-        """Aggregates Reddit comments and submissions up to (endpoint, search, date) level."""
+        """
+        Aggregates Reddit comments and submissions up to (endpoint, search, date) level.
+
+        Note:
+            The aggregate cache is updated incrementally.  For each query already in the cache, only
+            dates after the cache's `max_date` are read and aggregated, plus a trailing window of
+            `restatement_days` already-cached dates, since scores can change after the fact.  These
+            rows replace the cached rows for the same dates.  Queries not yet in the cache (and any
+            cache written with different sentiment columns) are aggregated in full.
+
+            Sentiment caches may predate an engine that has since been configured.  Rows lacking an
+            engine's scores are left out of its weighted sums, which are null for dates with no
+            scores at all.  (Rockets are counted in the text instead.)
+        """
 
         # Log
         log.info('Begin.')
@@ -61,40 +73,70 @@ class AggregationTransformer(Transformer):
             log.info(f'Cache is up-to-date.')
             return cache.load()
 
-        # Aggregate.
-        frames = []
-        for endpoint in ['comment', 'submission']:
-            for search, sentiments in data[f'reddit_{endpoint}s_sentiment'].items():
-                df = self._transform_chunk(endpoint, search, sentiments.load())
-                frames += [df]
+        # Which cached rows can be kept?  (Those before the restatement window, for queries already in the cache.)
+        df_old = self._get_df_cached(cache, min_date)
+        start = cache.max_date - timedelta(days=config.transformers.aggregation.restatement_days - 1) if len(df_old) > 0 else None
+        df_old = df_old[df_old['created_date'] < pandas.Timestamp(start)] if start is not None else df_old
+        cached = set(zip(df_old['endpoint'], df_old['search']))
+        log.info(f'Restating from = {start}, cached queries = {len(cached):,}.')
+
+        # Aggregate each query, across a process pool (unless `workers = 1`).  Results are merged in query order.
+        # (Workers' cache reads are returned with their results, and counted toward this call's profile.)
+        tasks = [
+            (endpoint, search, sentiments, start if (endpoint, f'{search[0]}={search[1]}') in cached else None)
+            for endpoint in ['comment', 'submission']
+            for search, sentiments in data[f'reddit_{endpoint}s_sentiment'].items()
+        ]
+        workers = min(config.transformers.aggregation.workers, len(tasks))
+        if workers <= 1:
+            frames = [df_old, *(_aggregate_query(self, *task) for task in tasks)]
+        else:
+            method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+            log.debug(f'Aggregating {len(tasks):,} queries with workers = {workers}, method = {method}.')
+            frames = [df_old]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context(method)) as executor:
+                for df_agg, stats in executor.map(partial(collect, _aggregate_query, self), *zip(*tasks)):
+                    frames += [df_agg]
+                    absorb(stats)
 
         # Cache.
-        df = pandas.concat(frames, ignore_index=True)
+        df = pandas.concat(frames, ignore_index=True).sort_values(['endpoint', 'search', 'created_date'], ignore_index=True)
         cache.overwrite(df, 'created_date', min_date, max_date)
 
         # Log, return.
-        log.info(f'Done with row count = {len(df):,}.')
+        log.info(f'Done with row count = {len(df):,}, aggregated = {len(df) - len(df_old):,}.')
         return df
 
+    def _get_df_cached(self, cache: DateRangeCache, min_date: date) -> DataFrame:
+        """Returns the cached aggregates, or an empty dataframe if they can't be extended (i.e. if a full rebuild is needed)."""
+        empty = DataFrame([], columns=list(self.schema.keys()))
+        if cache.max_date is None or cache.min_date > min_date:
+            return empty
+        df = cache.load()
+        if not set(self.schema.keys()).issubset(df.columns):
+            log.info('Cached aggregates have different columns.  Rebuilding.')
+            return empty
+        return df[list(self.schema.keys())]
+
     def _transform_chunk(self, endpoint: str, search: Tuple[str, str], df: DataFrame) -> DataFrame:
 
+        # Engine columns missing from the sentiment cache are loaded as nulls.
+        df = df.astype({x: 'float64' for x in self.columns})
+        counts = df.groupby(['created_date'])[self.weighted].count()
+
         # Aggregate.
         df_agg = (
             df
             .assign(**{
                 'num_samples': 1,
-                'num_rockets': lambda x: x['body' if endpoint == 'comment' else 'title'].str.count('🚀'),
-                'num_positive': lambda x: (x['positive'] > x['negative']) | (x['polarity'] > 0),
-                'num_negative': lambda x: (x['negative'] > x['positive']) | (x['polarity'] < 0),
+                'num_rockets': self._get_num_rockets(endpoint),
+                'num_positive': lambda x: self._get_is_positive(x, 1),
+                'num_negative': lambda x: self._get_is_positive(x, -1),
                 'sum_score': lambda x: x['score'],
                 'wnum_rockets': lambda x: x['score'] * x['num_rockets'],
                 'wnum_positive': lambda x: x['score'] * x['num_positive'],
                 'wnum_negative': lambda x: x['score'] * x['num_negative'],
-                'wsum_positive': lambda x: x['score'] * x['positive'],
-                'wsum_negative': lambda x: x['score'] * x['negative'],
-                'wsum_compound': lambda x: x['score'] * x['compound'],
-                'wsum_polarity': lambda x: x['score'] * x['polarity'],
-                'wsum_subjectivity': lambda x: x['score'] * x['subjectivity'],
+                **{f'wsum_{column}': (lambda x, column=column: x['score'] * x[column]) for column in self.weighted},
             })
             .groupby(['created_date'])
             .agg({
@@ -106,18 +148,13 @@ class AggregationTransformer(Transformer):
                 'wnum_rockets': 'sum',
                 'wnum_positive': 'sum',
                 'wnum_negative': 'sum',
-                'wsum_positive': 'sum',
-                'wsum_negative': 'sum',
-                'wsum_compound': 'sum',
-                'wsum_polarity': 'sum',
-                'wsum_subjectivity': 'sum',
+                **{f'wsum_{column}': 'sum' for column in self.weighted},
             })
             .assign(**{
-                'wavg_positive': lambda x: x['wsum_positive'] / x['sum_score'],
-                'wavg_negative': lambda x: x['wsum_negative'] / x['sum_score'],
-                'wavg_compound': lambda x: x['wsum_compound'] / x['sum_score'],
-                'wavg_polarity': lambda x: x['wsum_polarity'] / x['sum_score'],
-                'wavg_subjectivity': lambda x: x['wsum_subjectivity'] / x['sum_score'],
+                f'wsum_{column}': (lambda x, column=column: x[f'wsum_{column}'].where(counts[column] > 0)) for column in self.weighted
+            })
+            .assign(**{
+                f'wavg_{column}': (lambda x, column=column: x[f'wsum_{column}'] / x['sum_score']) for column in self.weighted
             })
             .sort_values(by='created_date')
             .reset_index()
@@ -129,5 +166,31 @@ class AggregationTransformer(Transformer):
         log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, df = {len(df):,}, df_agg = {len(df_agg):,}.')
         return df_agg
 
+    def _get_load_columns(self, endpoint: str) -> List[str]:
+        """Returns the sentiment cache columns needed for aggregation.  (Text is needed to count rockets, if not scored by the `rockets` engine.)"""
+        return ['created_date', 'score', 'body' if endpoint == 'comment' else 'title', *self.columns]
+
+    def _get_num_rockets(self, endpoint: str):
+        """Uses the `rockets` engine's column, if configured.  Rows it hasn't scored (and all rows, otherwise) count rockets in the text."""
+        text = 'body' if endpoint == 'comment' else 'title'
+        if 'rockets' in self.columns:
+            return lambda x: x['rockets'].fillna(x[text].str.count('🚀'))
+        return lambda x: x[text].str.count('🚀')
+
+    def _get_is_positive(self, df: DataFrame, sign: int) -> Series:
+        """Returns whether each row is positive (`sign = 1`) or negative (`sign = -1`), per any configured engine."""
+        result = Series(False, index=df.index)
+        if 'positive' in self.columns:
+            result |= sign * (df['positive'] - df['negative']) > 0
+        if 'polarity' in self.columns:
+            result |= sign * df['polarity'] > 0
+        return result
+
     def _get_cache_prefix(self) -> Path:
         return paths.data / 'reddit_aggregations'
+
+
+def _aggregate_query(transformer: AggregationTransformer, endpoint: str, search: Tuple[str, str], sentiments: DateRangeCache, min_date: date) -> DataFrame:
+    """Loads and aggregates one query's sentiment cache.  (Module-level, so that it can run in a worker process.)"""
+    df = sentiments.load(columns=transformer._get_load_columns(endpoint), min_date=min_date)
+    return transformer._transform_chunk(endpoint, search, df)
@@ -0,0 +1,142 @@
+import logging
+import numpy
+import string
+from pandas import Series
+from typing import List, Set
+from vaderSentiment import vaderSentiment as vader
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+log = logging.getLogger(__name__)
+
+
+
+class BatchVader:
+    """
+    A vectorized version of Vader's `SentimentIntensityAnalyzer.polarity_scores`, which scores a
+    whole batch of texts at once.
+
+    Vader scores one string at a time in pure Python, and most of that time is spent on the rules
+    for modifiers (boosters, negations, `but`, idioms, etc.), which are re-checked for every token.
+    However, most comments contain none of these.  For those, a text's score depends only on its
+    tokens' lexicon valences, its ALL CAPS words, and its `!` and `?` counts.  So, all texts in the
+    batch are tokenized together, valences are looked up via a single hashed join against the
+    lexicon, and per-text sums are accumulated via NumPy.  Any text containing a modifier falls
+    back to `SentimentIntensityAnalyzer.polarity_scores`.
+
+    Note:
+        Outputs match Vader's to within 1e-3 on `neg`, `neu` and `pos`, and 1e-4 on `compound`,
+        i.e. at most one unit in the last (rounded) digit.  In practice, they are identical, since
+        per-text sums are accumulated in the same order as Vader's.
+    """
+
+    def __init__(self, sia: SentimentIntensityAnalyzer = None):
+        self.sia: SentimentIntensityAnalyzer = sia if sia is not None else SentimentIntensityAnalyzer()
+        self.lexicon: Series = Series(self.sia.lexicon, dtype='float64')
+        self.modifiers: List[str] = sorted(
+            {x for x in vader.BOOSTER_DICT if ' ' not in x}
+            | {x for x in vader.SPECIAL_CASES if ' ' not in x}
+            | set(vader.NEGATE)
+            | {'but', 'kind', 'least', 'never', 'no', 'so', 'without'}
+        )
+        self.phrases: List[str] = sorted(x for x in [*vader.BOOSTER_DICT, *vader.SPECIAL_CASES] if ' ' in x)
+        self.emojis: Set[str] = {x for x in self.sia.emojis if len(x) == 1}
+        self.stats = {'texts': 0, 'fallbacks': 0}
+
+    def polarity_scores(self, texts: List[str]) -> numpy.ndarray:
+        """Returns Vader's `neg`, `neu`, `pos` and `compound` scores for each text, as an array of shape `(len(texts), 4)`."""
+        originals = list(texts)
+        scores = numpy.zeros((len(originals), 4))
+        if len(originals) == 0:
+            return scores
+
+        # Replace emojis with their textual descriptions (only for texts containing any).  All emojis are non-ASCII.
+        texts = Series(originals, dtype='object')
+        has_emoji = ~texts.map(str.isascii)
+        has_emoji[has_emoji] = texts[has_emoji].map(lambda x: not self.emojis.isdisjoint(x))
+        texts[has_emoji] = texts[has_emoji].map(self._replace_emojis)
+        texts = texts.str.strip()
+
+        # Tokenize all texts at once.  Strip punctuation from words, but keep emoticons, e.g. `:)`.
+        tokens = texts.str.split().explode().dropna()
+        stripped = tokens.str.strip(string.punctuation)
+        tokens = tokens.where(stripped.str.len() <= 2, stripped)
+        lower = tokens.str.lower()
+        codes = tokens.index.values.astype('int64')
+        position = tokens.groupby(level=0).cumcount().values
+
+        # Look up lexicon valences.
+        in_lexicon = lower.isin(self.lexicon.index).values
+        valence = lower.map(self.lexicon).fillna(0.0).values
+
+        # Lexicon words in ALL CAPS are emphasized, if only some of the text's words are ALL CAPS.
+        upper = tokens.str.isupper().values
+        count = numpy.bincount(codes, minlength=len(texts))
+        count_upper = numpy.bincount(codes, weights=upper, minlength=len(texts))
+        is_cap_diff = ((count - count_upper) > 0) & ((count - count_upper) < count)
+        emphasized = in_lexicon & upper & is_cap_diff[codes]
+        valence = numpy.where(emphasized, valence + numpy.where(valence > 0, vader.C_INCR, -vader.C_INCR), valence)
+
+        # Lexicon words preceded by `this` (and not by a lexicon word three tokens back) are emphasized.
+        previous = numpy.roll(lower.values, 1)
+        previous_3_in_lexicon = numpy.roll(in_lexicon, 3)
+        emphasized = in_lexicon & (position > 2) & (previous == 'this') & ~previous_3_in_lexicon
+        valence = numpy.where(emphasized, valence * 1.25, valence)
+
+        # Texts with any other modifiers (words, contractions, or multi-word phrases) fall back to Vader.
+        bigrams = Series(lower.values + ' ' + numpy.roll(lower.values, -1)).where(numpy.roll(codes, -1) == codes, '')
+        trigrams = Series(bigrams.values + ' ' + numpy.roll(lower.values, -2)).where(numpy.roll(codes, -2) == codes, '')
+        modified = (
+            lower.isin(self.modifiers).values
+            | lower.str.contains("n't", regex=False).values
+            | bigrams.isin(self.phrases).values
+            | trigrams.isin(self.phrases).values
+        )
+        fallback = numpy.bincount(codes, weights=modified, minlength=len(texts)) > 0
+
+        # Sum valences per text.
+        sum_s = numpy.bincount(codes, weights=valence, minlength=len(texts))
+        pos_sum = numpy.bincount(codes, weights=numpy.where(valence > 0, valence + 1, 0), minlength=len(texts))
+        neg_sum = numpy.bincount(codes, weights=numpy.where(valence < 0, valence - 1, 0), minlength=len(texts))
+        neu_count = numpy.bincount(codes, weights=(valence == 0), minlength=len(texts))
+
+        # Add emphasis from exclamation points and question marks.
+        ep_count = numpy.minimum(texts.str.count('!').values, 4)
+        qm_count = texts.str.count(r'\?').values
+        amplifier = ep_count * 0.292 + numpy.where(qm_count > 1, numpy.where(qm_count <= 3, qm_count * 0.18, 0.96), 0)
+        sum_s = numpy.where(sum_s > 0, sum_s + amplifier, numpy.where(sum_s < 0, sum_s - amplifier, sum_s))
+        pos_sum, neg_sum = (
+            numpy.where(pos_sum > numpy.abs(neg_sum), pos_sum + amplifier, pos_sum),
+            numpy.where(pos_sum < numpy.abs(neg_sum), neg_sum - amplifier, neg_sum),
+        )
+
+        # Normalize.
+        compound = numpy.clip(sum_s / numpy.sqrt(sum_s * sum_s + 15), -1, 1)
+        total = numpy.where(count > 0, pos_sum + numpy.abs(neg_sum) + neu_count, 1)
+        scores = numpy.where(
+            (count > 0)[:, None],
+            numpy.column_stack([numpy.abs(neg_sum / total), numpy.abs(neu_count / total), numpy.abs(pos_sum / total), compound]),
+            0.0,
+        )
+        scores = numpy.array([[round(x[0], 3), round(x[1], 3), round(x[2], 3), round(x[3], 4)] for x in scores.tolist()])
+
+        # Score fallback texts via Vader.
+        for i in numpy.flatnonzero(fallback):
+            result = self.sia.polarity_scores(originals[i])
+            scores[i] = [result['neg'], result['neu'], result['pos'], result['compound']]
+        self.stats['texts'] += len(originals)
+        self.stats['fallbacks'] += int(fallback.sum())
+        return scores
+
+    def _replace_emojis(self, text: str) -> str:
+        """Replaces emojis with their textual descriptions, exactly as `SentimentIntensityAnalyzer.polarity_scores` does."""
+        replaced = ''
+        prev_space = True
+        for character in text:
+            if character in self.sia.emojis:
+                if not prev_space:
+                    replaced += ' '
+                replaced += self.sia.emojis[character]
+                prev_space = False
+            else:
+                replaced += character
+                prev_space = character == ' '
+        return replaced
@@ -1,4 +1,5 @@
 import logging
+import numpy
 import pandas
 from pandas import DataFrame
 from typing import Dict, List
@@ -56,7 +57,7 @@ class DensifyTransformer(Transformer):
         return (
             data['reddit_aggregations']
             .merge(data['dt_s2rq'], how='left', on=['endpoint', 'search'])
-            .groupby(['symbol_id', 'endpoint', 'created_date'], as_index=False)
+            .groupby(['symbol_id', 'endpoint', 'created_date'], as_index=False, observed=True)
             .sum()
             .pipe(self._update_wavg)
         )
@@ -64,11 +65,9 @@ class DensifyTransformer(Transformer):
     def _update_wavg(self, df: DataFrame) -> DataFrame:
         """Re-calculates weighted-average metrics.  (Needed after aggregation.)"""
         return df.assign(**{
-            'wavg_positive': lambda x: x['wsum_positive'] / x['sum_score'],
-            'wavg_negative': lambda x: x['wsum_negative'] / x['sum_score'],
-            'wavg_compound': lambda x: x['wsum_compound'] / x['sum_score'],
-            'wavg_polarity': lambda x: x['wsum_polarity'] / x['sum_score'],
-            'wavg_subjectivity': lambda x: x['wsum_subjectivity'] / x['sum_score'],
+            'wavg_' + column[5:]: (lambda x, column=column: x[column] / x['sum_score'])
+            for column in df.columns
+            if column.startswith('wsum_')
         })
 
     def _get_df_available_dates(self, data: Dict) -> DataFrame:
@@ -117,50 +116,48 @@ class DensifyTransformer(Transformer):
         )
 
     def _get_df_calendar(self, data: Dict) -> DataFrame:
-        """Returns 'dense' date range for each symbol.  (Missing dates are injected.)"""
-        frames = []
-        for row in data['dt_available_dates'].itertuples():
-            df = DataFrame(pandas.date_range(row.min_available_date, row.max_available_date), columns=['date'])
-            df.insert(0, 'symbol_id', row.symbol_id)
-            df.insert(1, 'yahoo_symbol', row.yahoo_symbol)
-            frames += [df]
-        return pandas.concat(frames, ignore_index=True)
+        """
+        Returns 'dense' date range for each symbol.  (Missing dates are injected.)
+
+        Note:
+            The whole symbol-by-date grid is built in one vectorized step:  each symbol's row is
+            repeated once per available day, and each repeat is offset from the symbol's first
+            available date by its position within the symbol's range.
+        """
+        df = data['dt_available_dates']
+        days = df['available_days'].fillna(0).clip(lower=0).astype('int64').values
+        offsets = numpy.arange(days.sum()) - numpy.repeat(numpy.cumsum(days) - days, days)
+        return DataFrame({
+            'symbol_id': numpy.repeat(df['symbol_id'].values, days),
+            'yahoo_symbol': numpy.repeat(df['yahoo_symbol'].values, days),
+            'date': numpy.repeat(df['min_available_date'].values, days) + offsets.astype('timedelta64[D]'),
+        })
 
     def _get_df_features(self, data: Dict) -> DataFrame:
-        """Joins Yahoo and Reddit features onto 'dense' calendar records."""
-        return (
-            data['dt_calendar']
-            .merge(
-                right=self._get_df_yahoo_features(data, 'p'),
-                how='left',
-                on=['yahoo_symbol', 'date'],
-            )
-            .merge(
-                right=self._get_df_yahoo_features(data, 'pa', aggregate=True),
-                how='left',
-                on=['date'],
-            )
-            .merge(
-                right=self._get_df_reddit_features(data, 'comment', 'rc'),
-                how='left',
-                on=['symbol_id', 'date'],
-            )
-            .merge(
-                right=self._get_df_reddit_features(data, 'submission', 'rs'),
-                how='left',
-                on=['symbol_id', 'date'],
-            )
-            .merge(
-                right=self._get_df_reddit_features(data, 'comment', 'rca', aggregate=True),
-                how='left',
-                on=['date'],
-            )
-            .merge(
-                right=self._get_df_reddit_features(data, 'submission', 'rsa', aggregate=True),
-                how='left',
-                on=['date'],
-            )
-            .drop(columns=['yahoo_symbol'])
+        """
+        Joins Yahoo and Reddit features onto 'dense' calendar records.
+
+        Note:
+            Each feature table is indexed by its join key, then reindexed onto the calendar's keys,
+            so all feature blocks come out row-aligned with the calendar.  The blocks are then
+            concatenated side by side, once, rather than copying the whole (ever wider) frame for
+            each of a chain of merges.
+        """
+        calendar = data['dt_calendar']
+        by_yahoo_symbol = pandas.MultiIndex.from_frame(calendar[['yahoo_symbol', 'date']])
+        by_symbol = pandas.MultiIndex.from_frame(calendar[['symbol_id', 'date']])
+        by_date = pandas.Index(calendar['date'])
+        blocks = [
+            self._get_df_yahoo_features(data, 'p').set_index(['yahoo_symbol', 'date']).reindex(by_yahoo_symbol),
+            self._get_df_yahoo_features(data, 'pa', aggregate=True).set_index('date').reindex(by_date),
+            self._get_df_reddit_features(data, 'comment', 'rc').set_index(['symbol_id', 'date']).reindex(by_symbol),
+            self._get_df_reddit_features(data, 'submission', 'rs').set_index(['symbol_id', 'date']).reindex(by_symbol),
+            self._get_df_reddit_features(data, 'comment', 'rca', aggregate=True).set_index('date').reindex(by_date),
+            self._get_df_reddit_features(data, 'submission', 'rsa', aggregate=True).set_index('date').reindex(by_date),
+        ]
+        return pandas.concat(
+            [calendar[['symbol_id', 'date']], *[block.reset_index(drop=True) for block in blocks]],
+            axis=1,
         )
 
     def _get_df_yahoo_features(self, data: Dict, prefix: str, aggregate: bool = False) -> DataFrame:
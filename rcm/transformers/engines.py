@@ -0,0 +1,135 @@
+import logging
+import numpy
+from pandas import Series
+from textblob import TextBlob
+from typing import Dict, List
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from rcm.transformers.batch_vader import BatchVader
+log = logging.getLogger(__name__)
+
+
+
+class Engine:
+    """
+    Base sentiment engine.  Each engine scores a batch of texts into its own set of columns.
+
+    Attributes:
+        name (str):
+            Registry name, as used in `config.yaml`, e.g. `vader`.
+
+        namespace (str):
+            Identifies the values computed.  Engines computing identical values (e.g. `vader` and
+            `batch_vader`) share a namespace, so that their memoized values are interchangeable.
+
+        columns (List[str]):
+            Output columns, in order.
+
+    Note:
+        All engines should implement the `_score` method.  Analyzers are loaded lazily (on first
+        use), since some of them take a while to load.
+    """
+
+    def __init__(self):
+        self.name: str = None
+        self.namespace: str = None
+        self.columns: List[str] = None
+
+    def score(self, texts: List[str]) -> numpy.ndarray:
+        """Returns an array of shape `(len(texts), len(self.columns))`."""
+        if len(texts) == 0:
+            return numpy.zeros((0, len(self.columns)))
+        return numpy.asarray(self._score(texts), dtype='float64').reshape(len(texts), len(self.columns))
+
+    def _score(self, texts: List[str]):
+        raise NotImplementedError
+
+
+
+class VaderEngine(Engine):
+    """Vader Sentiment, scoring one text at a time."""
+
+    def __init__(self):
+        self.name: str = 'vader'
+        self.namespace: str = 'vader'
+        self.columns: List[str] = ['negative', 'neutral', 'positive', 'compound']
+        self.sia: SentimentIntensityAnalyzer = None
+
+    def _score(self, texts: List[str]) -> List[tuple]:
+        if self.sia is None:
+            self.sia = SentimentIntensityAnalyzer()
+        return [
+            (x['neg'], x['neu'], x['pos'], x['compound'])
+            for x in map(self.sia.polarity_scores, texts)
+        ]
+
+
+
+class BatchVaderEngine(Engine):
+    """Vader Sentiment, scoring a whole batch of texts at once.  (See `BatchVader`.)"""
+
+    def __init__(self):
+        self.name: str = 'batch_vader'
+        self.namespace: str = 'vader'
+        self.columns: List[str] = ['negative', 'neutral', 'positive', 'compound']
+        self.batch_vader: BatchVader = None
+
+    def _score(self, texts: List[str]) -> numpy.ndarray:
+        if self.batch_vader is None:
+            self.batch_vader = BatchVader()
+        return self.batch_vader.polarity_scores(texts)
+
+
+
+class TextBlobEngine(Engine):
+    """TextBlob's pattern-based polarity and subjectivity.  (Much slower than Vader.)"""
+
+    def __init__(self):
+        self.name: str = 'textblob'
+        self.namespace: str = 'textblob'
+        self.columns: List[str] = ['polarity', 'subjectivity']
+
+    def _score(self, texts: List[str]) -> List[tuple]:
+        return [tuple(TextBlob(x).sentiment) for x in texts]
+
+
+
+class RocketEngine(Engine):
+    """A lexicon-only scorer, counting rocket emojis (🚀), i.e. 'to the moon'."""
+
+    def __init__(self):
+        self.name: str = 'rockets'
+        self.namespace: str = 'rockets'
+        self.columns: List[str] = ['rockets']
+
+    def _score(self, texts: List[str]) -> numpy.ndarray:
+        return Series(texts, dtype='object').str.count('🚀').values
+
+
+
+# Registry of available engines, by name.
+engines: Dict[str, type] = {
+    'vader': VaderEngine,
+    'batch_vader': BatchVaderEngine,
+    'textblob': TextBlobEngine,
+    'rockets': RocketEngine,
+}
+
+# Engine instances, created once per process.
+_instances: Dict[str, Engine] = {}
+
+
+def get_engines(names: List[str]) -> List[Engine]:
+    """Returns engine instances for given names.  Raises an exception for unknown names, or if two engines produce the same column."""
+    unknown = [x for x in names if x not in engines]
+    if len(unknown) > 0:
+        raise Exception(f'Unknown sentiment engine(s):  {unknown}.  Available:  {list(engines)}.')
+    instances = [_instances.setdefault(x, engines[x]()) for x in names]
+    columns = get_columns(instances)
+    if len(columns) != len(set(columns)):
+        raise Exception(f'Sentiment engines produce duplicate columns:  engines = {names}, columns = {columns}.')
+    return instances
+
+
+def get_columns(instances: List[Engine]) -> List[str]:
+    """Returns all output columns of given engines, in order."""
+    return [column for engine in instances for column in engine.columns]
@@ -1,25 +1,99 @@
+import atexit
 import logging
 import multiprocessing as mp
-import pandas
+import numpy
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from multiprocessing.pool import Pool
 from pathlib import Path
+from functools import partial
 from pandas import DataFrame
-from textblob import TextBlob
 from typing import Dict, List, Tuple
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from rcm.core.cache import DateCache, DateRangeCache
+from rcm.core.cache import DateCache, DateRangeCache, MemoCache
 from rcm.core.config import paths, config
 from rcm.core.transformer import Transformer
 from rcm.extractors.reddit import RedditExtractor
-from rcm.utils.date_utils import epoch_to_est
+from rcm.transformers.engines import get_columns, get_engines
+from rcm.utils.date_utils import epoch_to_est_date
+from rcm.utils.profile_utils import absorb, collect
 log = logging.getLogger(__name__)
-sia = SentimentIntensityAnalyzer()
+_pool: Pool = None
+_pool_lock: threading.Lock = threading.Lock()
+
+
+
+def get_pool() -> Pool:
+    """
+    Returns the long-lived sentiment worker pool, creating it on first use.
+
+    Note:
+        Spawning processes and loading the sentiment engines is expensive, so the pool is
+        created once per run, and shared across all chunks, endpoints and searches.  Call
+        `close_pool` when finished.  (It is also called automatically at exit.)
+
+        Workers are started via `forkserver` (or `spawn`, where unavailable) rather than `fork`.
+        By the time the pool is created, this process is running other threads, e.g. the retry
+        executor and HTTP session pool, and forking a multi-threaded process can deadlock its
+        children on inherited locks (such as logging's).  The worker initializer loads everything
+        the workers need, so nothing is lost by not inheriting the parent's memory.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            return _pool
+        processes = config.transformers.sentiment.processes
+        method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        log.debug(f'Starting sentiment worker pool with processes = {processes}, method = {method}.')
+        _pool = mp.get_context(method).Pool(processes=processes, initializer=_initialize_worker, initargs=(config.transformers.sentiment.engines,))
+        return _pool
 
 
+def close_pool():
+    """Shuts down the sentiment worker pool (if running)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            return
+        log.debug('Stopping sentiment worker pool.')
+        _pool.close()
+        _pool.join()
+        _pool = None
 
-class SentimentTransformer(Transformer):
 
-    def __init__(self):
+atexit.register(close_pool)
+
+
+def _initialize_worker(names: List[str]):
+    """Preloads the engines in each worker process, so that the first chunk doesn't pay for it."""
+    for engine in get_engines(names):
+        engine.score(['warm up'])
+
+
+def _analyze_batch(rows: List[tuple], names: List[str]) -> List[tuple]:
+    """Scores a batch of `(key, text)` rows with the given engines, and returns `(key, *values)` rows."""
+    texts = [x[1] for x in rows]
+    scores = numpy.hstack([engine.score(texts) for engine in get_engines(names)])
+    return [(row[0], *values) for row, values in zip(rows, scores.tolist())]
+
+
+
+class SentimentTransformer(Transformer):
+    """
+    Performs sentiment analysis on Reddit comments or submissions.
+
+    Args:
+        engines (List[str]):
+            Names of the sentiment engines to run, e.g. `[vader]` for a quick daily refresh, or
+            `[batch_vader, textblob, rockets]` for an offline backfill.  (See `engines.py`.)  Each
+            engine adds its own columns to the output.  Defaults to `transformers.sentiment.engines`.
+    """
+
+    def __init__(self, engines: List[str] = None):
+        self.engines: List[str] = engines if engines is not None else config.transformers.sentiment.engines
+        self.columns: List[str] = get_columns(get_engines(self.engines))
         self.schema: Dict[str, str] = {
             'id': 'string',
             'created_utc': 'float64',
@@ -29,23 +103,19 @@ class SentimentTransformer(Transformer):
             'title': 'string',
             'body': 'string',
             'score': 'int64',
-            'negative': 'float64',
-            'neutral': 'float64',
-            'positive': 'float64',
-            'compound': 'float64',
-            'polarity': 'float64',
-            'subjectivity': 'float64',
+            **{column: 'float64' for column in self.columns},
         }
         self.unique_key: List[str] = ['id']
-        self.not_null: List[str] = ['negative']
+        self.not_null: List[str] = self.columns[:1]
+        self.memo: MemoCache = self._get_memo()
 
     def transform(self, endpoint: str, search: Tuple[str, str], min_score: int, caches: List[DateCache], chunk_size: int = None) -> DateRangeCache:
         """
         Performs sentiment analysis on Reddit comments or submissions.
 
         This function takes the Pushshift API responses, i.e. the zipped JSONs collected in a
-        previous step by RedditExtractor, and passes them through two sentiment analysis libraries:
-        Vader Sentiment and TextBlob.  Sentiment calculations can be slow and resource-intensive,
+        previous step by RedditExtractor, and passes them through the configured sentiment engines,
+        e.g. Vader Sentiment and TextBlob.  Sentiment calculations can be slow and resource-intensive,
         thus multiple performance optimizations have been implemented:
 
             1.  To reduce runtime, this code uses a multiprocessing pool to divide the sentiment
@@ -53,10 +123,12 @@ class SentimentTransformer(Transformer):
 
             2.  To reduce memory, this code divides the input data into chunks, and each chunk is
                 calculated sequentially.  (Each single chunk is evenly split across the workers.)
+                Each chunk's result is streamed into the cache as soon as it's finished, so peak
+                memory is bounded by `chunk_size`, regardless of how much data is inbound.
 
         When finished, the result is cached as a parquet file.  This parquet contains a curated
         subset of columns from the original API response, plus some additional columns for the
-        sentiment values produced by Vader and TextBlob.  Thus, this transformation step is actually
+        sentiment values produced by each engine.  Thus, this transformation step is actually
         doing two things:  calculating sentiments, and also converting the deeply-nested API
         response JSONs into a simpler, _flattened_, tabular structure.  Perhaps one day, this
         tabular structure could be stored in a SQL database.
@@ -102,27 +174,44 @@ class SentimentTransformer(Transformer):
             return range_cache
 
         # To reduce memory, process N megabytes at a time.
-        frames = []
+        # Stream each chunk into the cache as soon as it's done.
+        rows = 0
         chunk = []
         size = 0
         chunk_size = chunk_size if chunk_size else config.transformers.sentiment.chunk_size
-        for i, cache in enumerate(inbound):
-            chunk += [cache]
-            size += cache.path.stat().st_size
-            if size > (chunk_size * 1e6) or i == len(inbound) - 1:
-                df = self._transform_chunk(endpoint, search, min_score, chunk, size)
-                frames += [df]
-                chunk = []
-                size = 0
-
-        # Update cache.
-        df = pandas.concat(frames, ignore_index=True)
-        range_cache.append(df, 'created_date', min(x.date for x in caches), max(x.date for x in caches))
+        with range_cache.writer('created_date', min(x.date for x in caches), max(x.date for x in caches)) as writer:
+            for i, cache in enumerate(inbound):
+                chunk += [cache]
+                size += cache.path.stat().st_size
+                if size > (chunk_size * 1e6) or i == len(inbound) - 1:
+                    df = self._transform_chunk(endpoint, search, min_score, chunk, size)
+                    writer.write(df)
+                    rows += len(df)
+                    del df
+                    chunk = []
+                    size = 0
 
         # Log, return.
-        log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, rows = {len(df):,}.')
+        log.debug(f'Done with endpoint = {endpoint}, {search[0]} = {search[1]}, rows = {rows:,}.')
         return range_cache
 
+    @contextmanager
+    def deduplicating(self):
+        """
+        Within this context, each distinct text is scored at most once, across all calls to `transform`.
+        If the persistent memo is disabled, a temporary memo is used, and deleted when finished.
+        """
+        memo = self.memo
+        temporary = memo is None and config.transformers.sentiment.dedup
+        if temporary:
+            self.memo = self._get_memo(Path(tempfile.mkdtemp(prefix='rcm_memo_')) / 'memo.sqlite')
+        try:
+            yield self
+        finally:
+            if temporary:
+                shutil.rmtree(self.memo.path.parent, ignore_errors=True)
+                self.memo = memo
+
     def _transform_chunk(self, endpoint: str, search: Tuple[str, str], min_score: int, caches: List[dict], size: int) -> DataFrame:
 
         # Log
@@ -150,18 +239,32 @@ class SentimentTransformer(Transformer):
         # Join sentiments onto comments.
         return (
             df_comments
-            .assign(created_date=lambda x: epoch_to_est(x['created_utc']).dt.floor('D'))
+            .assign(created_date=lambda x: epoch_to_est_date(x['created_utc']))
             .join(df_sentiments)
             .pipe(self._validate)
         )
 
     def _analyze_comments(self, df_comments: DataFrame, column: str) -> DataFrame:
-        """Performs sentiment analysis on one 'chunk' of comments."""
+        """
+        Performs sentiment analysis on one 'chunk' of comments.
 
-        # Prepare comments as a list of (index, sentence) tuples.
-        inputs = (df_comments
-            .loc[:, [column]]
-            .to_records()
+        Note:
+            Each distinct text is scored at most once per chunk.  If the memo cache is enabled, texts
+            scored in previous chunks (or previous runs) are looked up rather than re-scored.
+        """
+
+        # Look up previously-scored texts by hash.
+        keys = df_comments[column].map(MemoCache.hash)
+        memoized = self.memo.get_many(keys.unique()) if self.memo is not None else {}
+
+        # Prepare unscored comments as a list of (key, sentence) tuples.
+        inputs = list(
+            df_comments
+            .assign(key=keys)
+            .loc[lambda x: ~x['key'].isin(memoized.keys())]
+            .drop_duplicates(subset='key')
+            .loc[:, ['key', column]]
+            .itertuples(index=False, name=None)
         )
 
         # Start timer.
@@ -171,15 +274,19 @@ class SentimentTransformer(Transformer):
         # Sentiment analysis is computationally expensive.
         # For big data, it's faster to distribute and parallelize the work across multiple processes.
         # For small data, it's faster to simply use a single process (due to overhead of spawning processes).
+        # Each process scores its whole share as one batch, so that batch engines can vectorize.
         if len(inputs) < 5000 or processes == 1:
-            log.debug(f'Analyzing {len(inputs):,} comments using 1 process.')
-            outputs = [self._analyze_comment(x) for x in inputs]
+            log.debug(f'Analyzing {len(inputs):,} comments using 1 process, engines = {self.engines}.')
+            outputs = _analyze_batch(inputs, self.engines)
 
         else:
             chunk_size = int(len(inputs) / processes) + 1
-            log.debug(f'Analyzing {len(inputs):,} comments using {processes} processes.')
-            with mp.Pool(processes=processes) as pool:
-                outputs = pool.map(self._analyze_comment, inputs, chunksize=chunk_size)
+            log.debug(f'Analyzing {len(inputs):,} comments using {processes} processes, engines = {self.engines}.')
+            chunks = [inputs[i:i + chunk_size] for i in range(0, len(inputs), chunk_size)]
+            outputs = []
+            for chunk, stats in get_pool().map(partial(collect, partial(_analyze_batch, names=self.engines)), chunks):
+                outputs += chunk
+                absorb(stats)
 
         # Stop timer.
         end_time = datetime.now()
@@ -187,19 +294,27 @@ class SentimentTransformer(Transformer):
         average_time = 1000 * elapsed_time / len(inputs) if len(inputs) != 0 else 0
         log.debug(f'Analyzed {len(inputs):,} comments in {elapsed_time:.2f} seconds ({average_time:.2f} ms per comment).')
 
-        # Return outputted tuples as dataframe.
-        return (
-            DataFrame(outputs, columns=['index', 'negative', 'neutral', 'positive', 'compound', 'polarity', 'subjectivity'])
-            .set_index('index', drop=True)
+        # Memoize new scores.
+        scores = {x[0]: x[1:] for x in outputs}
+        if self.memo is not None:
+            self.memo.put_many(scores)
+            log.debug(f'Memo cache:  rows = {len(df_comments):,}, memoized = {len(memoized):,}, scored = {len(scores):,}, stats = {self.memo.stats}, hit_rate = {self.memo.hit_rate():.1%}.')
+        scores.update(memoized)
+
+        # Return scores as dataframe (aligned to inbound comments).
+        return DataFrame(
+            [scores[x] for x in keys],
+            columns=self.columns,
+            index=df_comments.index,
         )
 
-    def _analyze_comment(self, row: tuple) -> tuple:
-        """Performs sentiment analysis (both Vader and TextBlob) on given text string."""
-        index = row[0]
-        text = row[1]
-        vader = sia.polarity_scores(text)
-        blob = TextBlob(text)
-        return (index, vader['neg'], vader['neu'], vader['pos'], vader['compound'], blob.sentiment.polarity, blob.sentiment.subjectivity)
+    def _get_memo(self, path: Path = None) -> MemoCache:
+        """Returns the sentiment memo cache (or None, if disabled).  If `path` is given, returns a memo cache at that path instead."""
+        if path is None and not config.transformers.sentiment.memo:
+            return None
+        path = path if path is not None else paths.data / 'reddit_sentiment_memo' / 'memo.sqlite'
+        namespace = '+'.join(engine.namespace for engine in get_engines(self.engines))
+        return MemoCache(path, namespace, config.transformers.sentiment.memo_max_rows)
 
     def _get_cache_prefix(self, endpoint: str, search: Tuple[str, str], min_score: int) -> Path:
         """Returns cache path prefix for given endpoint and search filter."""
@@ -9,14 +9,15 @@ def date_to_datetime(x: date) -> datetime:
     return datetime(x.year, x.month, x.day)
 
 
-def epoch_to_est(column: Series):
+def epoch_to_est(column: Series) -> Series:
     """Converts an epoch (e.g. 1580531187) to a timezone-naive EST timestamp (e.g. 2020-01-01 00:00:00)."""
-    # Convert from epoch to UTC.
-    column = pd.to_datetime(column, unit='s')
-    # Convert from UTC to EST.
-    column = column.dt.tz_localize('UTC').dt.tz_convert('America/New_York')
-    # Convert from timezone-aware to timezone-naive.  (Yikes.)
-    return pd.to_datetime(column.dt.strftime('%Y-%m-%d %H:%M:%S.%f'))
+    # Convert from epoch to UTC, then from UTC to EST, then drop the timezone.  (All vectorized.)
+    return pd.to_datetime(column, unit='s', utc=True).dt.tz_convert('America/New_York').dt.tz_localize(None)
+
+
+def epoch_to_est_date(column: Series) -> Series:
+    """Converts an epoch (e.g. 1580531187) to its EST date, as a timezone-naive midnight timestamp (e.g. 2020-01-01 00:00:00)."""
+    return epoch_to_est(column).dt.floor('D')
 
 
 def path_to_date(path: Path) -> date:
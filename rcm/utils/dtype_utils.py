@@ -0,0 +1,59 @@
+import logging
+import pandas as pd
+from pandas import DataFrame, Series
+from typing import Callable, List
+log = logging.getLogger(__name__)
+
+
+# Low-cardinality columns, stored as categoricals in compact mode.
+CATEGORICAL: List[str] = ['endpoint', 'search', 'symbol', 'symbol_id', 'yahoo_symbol', 'subreddit', 'author']
+
+# Columns that must keep full precision, e.g. epoch timestamps, which float32 rounds by up to a minute.
+PRECISE: List[str] = ['created_utc']
+
+# Memory-accounting hooks, called as `hook(name, bytes_before, bytes_after)` whenever a dataframe is compacted.
+memory_hooks: List[Callable[[str, int, int], None]] = []
+
+
+def compact_dtypes(df: DataFrame, name: str = None) -> DataFrame:
+    """
+    Converts a dataframe's columns to memory-compact data types, then reports the savings to each
+    of `memory_hooks`.
+
+    Note:
+        Low-cardinality text columns (see `CATEGORICAL`) become categoricals.  Other text columns
+        become Arrow-backed strings.  Floats become `float32` (except `PRECISE` columns), and
+        `int64` columns become `int32`, if their values fit.  (Integers are not downcast any further, since arithmetic on e.g.
+        `int8` counters silently overflows.)  Dates and booleans are left as is.
+    """
+    before = get_memory_usage(df)
+    df = df.assign(**{column: _compact(column, df[column]) for column in df.columns})
+    after = get_memory_usage(df)
+    for hook in memory_hooks:
+        hook(name, before, after)
+    return df
+
+
+def get_memory_usage(df: DataFrame) -> int:
+    """Returns a dataframe's total memory usage in bytes, including the contents of object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _compact(column: str, series: Series) -> Series:
+    is_text = pd.api.types.is_string_dtype(series.dtype) and pd.api.types.infer_dtype(series, skipna=True) in ['string', 'empty']
+    if column in CATEGORICAL and is_text:
+        return series.astype('category')
+    if is_text and not pd.api.types.is_categorical_dtype(series.dtype):
+        return series.astype('string[pyarrow]')
+    if pd.api.types.is_float_dtype(series.dtype) and column not in PRECISE:
+        return series.astype('float32')
+    if series.dtype == 'int64' and (len(series) == 0 or (series.min() >= -2**31 and series.max() < 2**31)):
+        return series.astype('int32')
+    return series
+
+
+def _log_memory(name: str, before: int, after: int):
+    log.debug(f'Compacted {name}:  {before / 1e6:,.2f} MB -> {after / 1e6:,.2f} MB ({1 - after / before if before > 0 else 0:.0%} saved).')
+
+
+memory_hooks.append(_log_memory)
@@ -0,0 +1,218 @@
+import contextvars
+import cProfile
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from pandas import DataFrame
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+from rcm.core.config import config, paths
+log = logging.getLogger(__name__)
+
+# Peak RSS is read via `resource`, which is unavailable on Windows.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# Identifies this run's report file.
+run_id: str = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+# Profile scopes active in the current context (innermost last).  I/O is counted toward all of them.
+_scopes: contextvars.ContextVar = contextvars.ContextVar('scopes', default=())
+
+# Serializes counter updates and report writes.
+_lock: threading.Lock = threading.Lock()
+
+
+
+class Record:
+    """Measurements for a single profiled call."""
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.start: datetime = datetime.now()
+        self.counters: Dict[str, int] = {
+            'rows_read': 0,
+            'rows_written': 0,
+            'bytes_read': 0,
+            'bytes_written': 0,
+            'http_requests': 0,
+            'http_bytes': 0,
+        }
+        self.http_seconds: float = 0
+        self.rows_in: int = 0
+        self.rows_out: int = None
+        self.peak_rss_workers_mb: float = None
+
+    def to_dict(self, wall_seconds: float, cpu_seconds: float, error: str) -> Dict:
+        return {
+            'run_id': run_id,
+            'name': self.name,
+            'start': self.start.isoformat(),
+            'wall_seconds': round(wall_seconds, 6),
+            'cpu_seconds': round(cpu_seconds, 6),
+            'peak_rss_mb': _get_peak_rss_mb(),
+            'peak_rss_workers_mb': self.peak_rss_workers_mb,
+            'rows_in': self.rows_in + self.counters['rows_read'],
+            'rows_out': self.rows_out if self.rows_out is not None else self.counters['rows_written'],
+            **self.counters,
+            'http_seconds': round(self.http_seconds, 6),
+            'error': error,
+        }
+
+
+
+@contextmanager
+def profile(name: str):
+    """
+    Measures a block of code, then appends one JSON line to the run report (if profiling is enabled).
+
+    Each record holds the block's wall time, CPU time (of the calling thread), peak RSS, rows and
+    bytes read and written (via `add_io`), and HTTP requests made (via `add_http`).  Nested blocks
+    are recorded separately, and inner blocks' I/O counts toward outer blocks too.  Rows in are the
+    rows read from cache, plus `record.rows_in`.  Rows out are `record.rows_out`, if set, or else
+    the rows written to cache.
+
+    Example:
+        >>> with profile('SentimentTransformer.transform') as record:
+        ...     df = transform()
+        ...     record.rows_out = len(df)
+
+    Note:
+        CPU time covers the calling thread only, and peak RSS is this process's high-water mark so
+        far.  Work done in other threads counts toward I/O only, if started via `thread_map` or
+        `retry_with_timeout`, which carry the active scopes over.  Work done in worker processes
+        counts toward I/O only if each task is run via `collect`, and its stats are passed to
+        `absorb`.  Its workers' highest peak RSS is then reported as `peak_rss_workers_mb`.  (The
+        OS only reports children's RSS once they exit, and pool workers outlive most scopes.)
+
+        If `config.profile.cprofile` is set, the outermost block in each thread is also captured
+        via cProfile, into a `.prof` file next to the run report.
+    """
+    if not config.profile.enabled:
+        yield None
+        return
+    record = Record(name)
+    outermost = len(_scopes.get()) == 0
+    token = _scopes.set(_scopes.get() + (record,))
+    profiler = cProfile.Profile() if config.profile.cprofile and outermost else None
+    error = None
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    except BaseException as e:
+        error = f'{e.__class__.__name__}: {e}'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_seconds = time.perf_counter() - start_wall
+        cpu_seconds = time.thread_time() - start_cpu
+        _scopes.reset(token)
+        _write(record.to_dict(wall_seconds, cpu_seconds, error))
+        if profiler is not None:
+            profiler.dump_stats(get_report_path().with_name(f'{run_id}.{name}.{threading.get_ident()}.prof'))
+
+
+def profiled(name: str = None) -> Callable:
+    """
+    Decorates a function with `profile`.  Dataframe arguments count as rows in, and a dataframe
+    return value counts as rows out.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile(name or func.__qualname__) as record:
+                result = func(*args, **kwargs)
+                if record is not None:
+                    record.rows_in += sum(len(x) for x in [*args, *kwargs.values()] if isinstance(x, DataFrame))
+                    record.rows_out = len(result) if isinstance(result, DataFrame) else None
+                return result
+        return wrapper
+    return decorator
+
+
+def add_io(rows_read: int = 0, rows_written: int = 0, bytes_read: int = 0, bytes_written: int = 0):
+    """Counts rows and bytes read or written toward all active profile scopes."""
+    _add(rows_read=rows_read, rows_written=rows_written, bytes_read=bytes_read, bytes_written=bytes_written)
+
+
+def add_http(seconds: float, bytes: int):
+    """Counts one HTTP request toward all active profile scopes."""
+    _add(seconds, http_requests=1, http_bytes=bytes)
+
+
+def propagate(func: Callable) -> Callable:
+    """
+    Returns a callable that runs `func` within the caller's active profile scopes, e.g. when `func`
+    is handed to another thread.  Scopes don't cross process boundaries.  (See `collect`.)
+    """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+def collect(func: Callable, *args, **kwargs) -> Tuple[Any, Dict]:
+    """
+    Runs `func` (e.g. as a worker process's task) within a fresh profile scope, and returns its
+    result, plus the scope's I/O counters and the process's peak RSS.  The caller should pass these
+    stats to `absorb`, e.g.:
+
+        >>> for result, stats in executor.map(partial(collect, func), items):
+        ...     absorb(stats)
+    """
+    record = Record('worker')
+    token = _scopes.set((record,))
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        _scopes.reset(token)
+    return result, {**record.counters, 'http_seconds': record.http_seconds, 'peak_rss_mb': _get_peak_rss_mb()}
+
+
+def absorb(stats: Dict):
+    """Counts a worker's stats (as returned by `collect`) toward all active profile scopes."""
+    stats = dict(stats)
+    peak_rss_mb = stats.pop('peak_rss_mb')
+    _add(stats.pop('http_seconds'), **stats)
+    with _lock:
+        for record in _scopes.get():
+            if peak_rss_mb is not None:
+                record.peak_rss_workers_mb = max(peak_rss_mb, record.peak_rss_workers_mb or 0)
+
+
+def get_report_path() -> Path:
+    """Returns this run's JSONL report path."""
+    return paths.data / '_profiles' / f'{run_id}.jsonl'
+
+
+def _add(http_seconds: float = 0, **counters: int):
+    scopes: Tuple[Record] = _scopes.get()
+    if len(scopes) == 0:
+        return
+    with _lock:
+        for record in scopes:
+            for key, value in counters.items():
+                record.counters[key] += value
+            record.http_seconds += http_seconds
+
+
+def _write(row: Dict):
+    path = get_report_path()
+    with _lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a') as file:
+            file.write(json.dumps(row) + '\n')
+
+
+def _get_peak_rss_mb() -> float:
+    # Linux reports kilobytes.  (macOS reports bytes.)
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource is not None else None
@@ -0,0 +1,43 @@
+import threading
+import time
+
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket, used to cap the total request rate across many worker threads.
+
+    Args:
+        rate (float):
+            Tokens replenished per second, i.e. the sustained requests-per-second budget.
+
+        capacity (float):
+            Maximum number of tokens the bucket can hold, i.e. the largest burst allowed.
+            Defaults to `rate` (or 1, whichever is larger).
+
+    Note:
+        Every worker calls `acquire` before hitting the API.  Since the bucket is shared, the
+        aggregate request rate never exceeds `rate`, no matter how many workers are running.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate: float = rate
+        self.capacity: float = capacity if capacity is not None else max(rate, 1)
+        self.tokens: float = self.capacity
+        self.updated: float = time.monotonic()
+        self.lock: threading.Lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Blocks until `tokens` are available, then consumes them.  Returns seconds spent waiting."""
+        waited = 0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
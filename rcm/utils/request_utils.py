@@ -1,13 +1,120 @@
-import requests
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from requests import Session
+from requests.adapters import HTTPAdapter
+from typing import Dict, Iterator, List
+from rcm.utils.profile_utils import add_http
+from rcm.utils.rate_utils import TokenBucket
 from rcm.utils.retry_utils import retry_with_timeout
 
 
 
-@retry_with_timeout(tries=10, delay=5, timeout=60)
-def get_request(url: str, params: dict, iteration: int = 0) -> dict:
+class SessionPool:
     """
-    Wraps `requests.get` call for multiple reasons:
+    A pool of long-lived `requests.Session` objects, shared by all threads.
+
+    Args:
+        pool_size (int):
+            Maximum number of keep-alive connections each session holds (per host).
+
+        gzip (bool):
+            If true, responses are requested with gzip (or deflate) transfer encoding.
+
+        max_sessions (int):
+            Maximum number of sessions (and thus open sockets) across all threads.  Once reached,
+            threads wait for an idle session rather than creating a new one.
+
+    Note:
+        A bare `requests.get` opens (and closes) a brand-new TCP/TLS connection on every call.
+        Sessions keep their connections alive, so consecutive pages reuse the same socket.  Since
+        sessions are not guaranteed to be thread-safe, each session is checked out by one thread
+        at a time, and returned to the pool afterward.  (Requests often run on short-lived retry
+        threads, so a thread-local session would rarely get reused.)
+    """
+
+    def __init__(self, pool_size: int = 4, gzip: bool = True, max_sessions: int = 8):
+        self.pool_size: int = pool_size
+        self.gzip: bool = gzip
+        self.max_sessions: int = max_sessions
+        self.sessions: List[Session] = []
+        self.idle: List[Session] = []
+        self.lock: threading.Lock = threading.Lock()
+        self.available: threading.Condition = threading.Condition(self.lock)
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """
+        Checks out an idle session, and returns it when done.  If none are idle, a new session is
+        created, unless `max_sessions` already exist, in which case we wait for one to be returned.
+        """
+        with self.available:
+            while len(self.idle) == 0 and len(self.sessions) >= self.max_sessions:
+                self.available.wait()
+            if len(self.idle) > 0:
+                session = self.idle.pop()
+            else:
+                session = self._create()
+                self.sessions += [session]
+        try:
+            yield session
+        finally:
+            with self.available:
+                self.idle += [session]
+                self.available.notify()
+
+    def _create(self) -> Session:
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session = Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        session.headers['Accept-Encoding'] = 'gzip, deflate' if self.gzip else 'identity'
+        return session
+
+    def stats(self) -> Dict[str, int]:
+        """Returns connection reuse counters, summed across all sessions."""
+        num_requests = 0
+        num_connections = 0
+        with self.lock:
+            for session in self.sessions:
+                for adapter in set(session.adapters.values()):
+                    pools = adapter.poolmanager.pools
+                    for key in pools.keys():
+                        pool = pools.get(key)
+                        if pool is not None:
+                            num_requests += pool.num_requests
+                            num_connections += pool.num_connections
+        return {
+            'sessions': len(self.sessions),
+            'requests': num_requests,
+            'connections': num_connections,
+            'reused': num_requests - num_connections,
+        }
+
+    def close(self):
+        """Closes all sessions (and their connections)."""
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+            self.idle = []
+
+
+sessions = SessionPool()
+
+
+def _acquire_token(url: str, params: dict, iteration: int = 0, limiter: TokenBucket = None, pool: SessionPool = None):
+    """Waits for a rate limiter token (if any) before each `get_request` attempt."""
+    if limiter is not None:
+        limiter.acquire()
+
+
+@retry_with_timeout(tries=10, delay=5, timeout=60, max_delay=120, prepare=_acquire_token)
+def get_request(url: str, params: dict, iteration: int = 0, limiter: TokenBucket = None, pool: SessionPool = None) -> dict:
+    """
+    Wraps a pooled `requests` GET call for multiple reasons:
 
         1.  We add retry logic, to ensure network blips and throttled requests don't kill the app.
 
@@ -15,9 +122,23 @@ def get_request(url: str, params: dict, iteration: int = 0) -> dict:
             to troubleshoot an iterative pull, post-mortem).
 
         3.  We ensure the response is JSON-serializable (so that it can be cached).
+
+        4.  If a `limiter` is given, every attempt (including retries) waits for a token first.  This
+            way, concurrent workers sharing one limiter never exceed the API's rate limit.  (The
+            wait happens before the attempt is timed, so throttling never causes a timeout.)
+
+        5.  We reuse pooled keep-alive connections (via `pool`, or the module-level default), rather
+            than paying for a new TCP/TLS handshake on every page.  A native socket timeout ensures
+            that abandoned (timed-out) calls eventually release their thread.
+
+        6.  Every attempt's duration and (compressed) response size is counted toward the active
+            profile scopes, if any.
     """
     request_time = datetime.utcnow()
-    response = requests.get(url=url, params=params)
+    start_time = time.perf_counter()
+    with (pool if pool is not None else sessions).session() as session:
+        response = session.get(url=url, params=params, timeout=60)
+    add_http(time.perf_counter() - start_time, int(response.headers.get('Content-Length', len(response.content))))
     response.raise_for_status()
     response_json = response.json()
     return {
@@ -1,13 +1,29 @@
 import logging
+import random
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import wraps
-from multiprocessing.pool import ThreadPool
-from typing import Any
+from typing import Any, Callable, Dict, Set
+from rcm.utils.profile_utils import propagate
 log = logging.getLogger(__name__)
 
 
 
-def retry_with_timeout(tries: int, delay: int, timeout: int) -> Any:
+# A single long-lived executor runs every wrapped call.  (Previously, a new thread pool was created
+# and torn down on every attempt.)  Threads that exceed their timeout cannot be killed, so they are
+# abandoned, and tracked here until they finish on their own.
+max_workers: int = 32
+_executor: ThreadPoolExecutor = None
+_abandoned: Set[Future] = set()
+_stats: Dict[str, int] = {'attempts': 0, 'failures': 0, 'timeouts': 0, 'abandoned': 0}
+_lock: threading.Lock = threading.Lock()
+
+
+def retry_with_timeout(tries: int, delay: float, timeout: float, backoff: float = 2, max_delay: float = 300, jitter: bool = True, prepare: Callable = None) -> Any:
     """
     Calls a function in a separate thread with retries and a timeout condition.
 
@@ -15,36 +31,125 @@ def retry_with_timeout(tries: int, delay: int, timeout: int) -> Any:
         tries (int):
             The maximum number of times we will attempt the wrapped function.
 
-        delay (int):
-            Delay in seconds between failed attempts.
+        delay (float):
+            Delay in seconds after the first failed attempt.
 
-        timeout (int):
+        timeout (float):
             Timeout in seconds.  If the function's runtime exceeds this amount, a timeout exception
             is raised, which triggers a retry.  (Be careful, the original function/thread is not
-            killed.)
+            killed.  It is abandoned, and counted in `retry_stats`.)  The clock starts once the
+            function begins running, so time spent queued for a free executor thread is not counted.
+
+        backoff (float):
+            Multiplier applied to the delay after each failed attempt, i.e. exponential backoff.
+
+        max_delay (float):
+            Upper bound on the delay between attempts.
+
+        jitter (bool):
+            If true, each delay is randomized within [delay / 2, delay], so that many concurrent
+            callers don't retry in lockstep.
+
+        prepare (Callable):
+            If given, called with the function's arguments before every attempt, outside of the
+            timed region, e.g. to wait for a rate limiter token.
 
     Returns:
         Any:  The function's return value.
 
-    References:
-        This implementation was inspired by:
-        https://stackoverflow.com/questions/29494001/how-can-i-abort-a-task-in-a-multiprocessing-pool-after-a-timeout
+    Note:
+        If an attempt fails with HTTP 429 (Too Many Requests), and the response includes a
+        `Retry-After` header, we wait as long as the server asks instead.
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
 
             for i in range(tries):
+                if prepare is not None:
+                    prepare(*args, **kwargs)
+                started = threading.Event()
+                future = _get_executor().submit(propagate(_run), started, func, *args, **kwargs)
+                _increment('attempts')
                 try:
-                    with ThreadPool(1) as pool:
-                        apply_result = pool.apply_async(func, args=args, kwds=kwargs)
-                        return apply_result.get(timeout=timeout)
+                    started.wait()
+                    return future.result(timeout=timeout)
                 except Exception as e:
+                    _increment('failures')
+                    if isinstance(e, FutureTimeoutError):
+                        _abandon(future)
+                        e = TimeoutError(f'Timed out after {timeout} seconds.')
                     log.warning(f'Attempt {i + 1} of {tries} failed with {e.__class__.__name__}: {e}.')
                     if i + 1 < tries:
-                        time.sleep(delay)
+                        time.sleep(_get_delay(e, i, delay, backoff, max_delay, jitter))
                     else:
                         raise e
 
         return wrapper
     return decorator
+
+
+def retry_stats() -> Dict[str, int]:
+    """
+    Returns counters describing all retried calls so far.
+
+    Note:
+        `abandoned` counts every thread that ever exceeded its timeout, whereas `leaked` counts
+        abandoned threads that are still running right now.
+    """
+    with _lock:
+        for future in [x for x in _abandoned if x.done()]:
+            _abandoned.remove(future)
+        return {**_stats, 'leaked': len(_abandoned)}
+
+
+def _run(started: threading.Event, func: Callable, *args, **kwargs) -> Any:
+    """Runs a wrapped call, first signaling that it has left the executor's queue."""
+    started.set()
+    return func(*args, **kwargs)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='retry')
+        return _executor
+
+
+def _increment(key: str):
+    with _lock:
+        _stats[key] += 1
+
+
+def _abandon(future: Future):
+    """Cancels a timed-out call.  If it's already running, it can't be cancelled, so we abandon it."""
+    _increment('timeouts')
+    if not future.cancel():
+        with _lock:
+            _stats['abandoned'] += 1
+            _abandoned.add(future)
+        log.warning(f'Abandoned a timed-out thread:  stats = {retry_stats()}.')
+
+
+def _get_delay(e: Exception, i: int, delay: float, backoff: float, max_delay: float, jitter: bool) -> float:
+    """Returns seconds to wait after failed attempt `i`.  Honors `Retry-After` on HTTP 429."""
+    response = getattr(e, 'response', None)
+    if response is not None and response.status_code == 429 and 'Retry-After' in response.headers:
+        retry_after = _parse_retry_after(response.headers['Retry-After'])
+        if retry_after is not None:
+            return retry_after
+    seconds = min(max_delay, delay * backoff ** i)
+    return random.uniform(seconds / 2, seconds) if jitter else seconds
+
+
+def _parse_retry_after(value: str) -> float:
+    """Parses a `Retry-After` header, which is either a number of seconds or an HTTP date."""
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,36 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List
+from rcm.utils.profile_utils import propagate
+
+
+
+def thread_map(func: Callable, items: Iterable, workers: int) -> List[Any]:
+    """
+    Applies `func` to every item across a bounded thread pool, and returns results in input order.
+
+    Args:
+        func (Callable):
+            Function to apply.  Must be thread-safe.
+
+        items (Iterable):
+            Work items.
+
+        workers (int):
+            Maximum number of concurrent threads.  If 1 (or fewer), work is done in the calling
+            thread.
+
+    Note:
+        If any work item fails, all pending (not-yet-started) work items are cancelled, and the
+        first exception is re-raised.  Work items run within the caller's profile scopes (if any),
+        so their I/O is counted toward the caller.
+    """
+    items = list(items)
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [func(x) for x in items]
+    executor = ThreadPoolExecutor(max_workers=min(workers, len(items)))
+    try:
+        func = propagate(func)
+        futures = [executor.submit(func, x) for x in items]
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
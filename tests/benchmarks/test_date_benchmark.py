@@ -0,0 +1,38 @@
+import logging
+import numpy
+import pandas as pd
+import time
+from pandas import Series
+from rcm.utils.date_utils import epoch_to_est, epoch_to_est_date
+log = logging.getLogger(__name__)
+
+
+
+def test_epoch_to_est_benchmark():
+    """Measures epoch-to-EST conversion against the old string round-trip, on one million epochs spanning several DST changes."""
+
+    # One million epochs, from 2019-12-31 to 2022-07-01 UTC.
+    epochs = Series(numpy.random.default_rng(0).integers(1577750400, 1656633600, 1_000_000))
+
+    # The old conversion formatted every timestamp as a string, then parsed it again.
+    def epoch_to_est_legacy(column: Series) -> Series:
+        column = pd.to_datetime(column, unit='s')
+        column = column.dt.tz_localize('UTC').dt.tz_convert('America/New_York')
+        return pd.to_datetime(column.dt.strftime('%Y-%m-%d %H:%M:%S.%f'))
+
+    # Convert.
+    start_time = time.perf_counter()
+    expected = epoch_to_est_legacy(epochs)
+    legacy_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    actual = epoch_to_est(epochs)
+    fast_time = time.perf_counter() - start_time
+
+    # Report.
+    log.info(f'epoch_to_est:  legacy = {legacy_time:.3f} s, fast = {fast_time:.3f} s, speedup = {legacy_time / fast_time:,.1f}x.')
+
+    # Validate.
+    assert actual.equals(expected)
+    assert epoch_to_est_date(epochs).equals(expected.dt.floor('D'))
+    assert epoch_to_est(Series([1583647200, 1583650800])).tolist() == [pd.Timestamp('2020-03-08 01:00'), pd.Timestamp('2020-03-08 03:00')]
+    assert fast_time < legacy_time
@@ -0,0 +1,54 @@
+import logging
+import pytest
+import time
+from datetime import date
+from rcm.core.config import config
+from rcm.extractors.reddit import RedditExtractor
+from rcm.utils.retry_utils import retry_stats
+log = logging.getLogger(__name__)
+
+
+
+@pytest.mark.parametrize('name, workers, windows, throttle_rate', [
+    ('sequential', 1, 1, 0),
+    ('concurrent', 8, 1, 0),
+    ('adaptive', 1, 24, 0),
+    ('throttled', 8, 1, 0.1),
+])
+def test_reddit_extraction_benchmark(pushshift, monkeypatch, name, workers, windows, throttle_rate):
+    """Measures RedditExtractor throughput against a local FakePushshift server with 10 ms latency."""
+
+    # Configure server and extractor.
+    pushshift.rows_per_hour = 150
+    pushshift.latency = 0.01
+    pushshift.throttle_rate = throttle_rate
+    monkeypatch.setattr(config.extractors.reddit, 'windows', windows)
+
+    # Extract.
+    retries_before = retry_stats()
+    start_time = time.perf_counter()
+    caches = RedditExtractor().extract(
+        endpoint='comment',
+        search=('word', 'doge'),
+        min_score=None,
+        min_date=date(2021, 1, 1),
+        max_date=date(2021, 1, 4),
+        workers=workers,
+    )
+    elapsed_time = time.perf_counter() - start_time
+    retries_after = retry_stats()
+
+    # Report.
+    rows = sum(x['response']['rows'] for cache in caches for x in cache.load())
+    requests = pushshift.stats['requests']
+    retries = retries_after['failures'] - retries_before['failures']
+    log.info(
+        f'{name}:  elapsed = {elapsed_time:.2f} s, requests = {requests:,}, rows = {rows:,}, '
+        f'requests/sec = {requests / elapsed_time:,.1f}, rows/sec = {rows / elapsed_time:,.1f}, '
+        f'retries = {retries:,} ({retries / requests:.1%} of requests).'
+    )
+
+    # Validate.
+    assert len(caches) == 4
+    assert rows >= 0.99 * 4 * 24 * pushshift.rows_per_hour * 0.8
+    assert retries == pushshift.stats['throttled']
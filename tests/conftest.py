@@ -10,8 +10,11 @@ if str(path_repo) not in sys.path:
     sys.path.insert(0, str(path_repo))
 
 # Internal imports.
-from rcm.core.config import paths
+import rcm.extractors.reddit
+from rcm.core.config import paths, config
 from rcm.utils.log_utils import initialize_logger
+from rcm.utils.rate_utils import TokenBucket
+from tests.fakes.pushshift import FakePushshift
 
 # Logger.
 log = logging.getLogger(__name__)
@@ -26,5 +29,19 @@ def log_file(worker_id):
     log.info('worker_id = {0}'.format(worker_id))
 
 
+@pytest.fixture
+def pushshift(tmp_path, monkeypatch):
+    """
+    Points RedditExtractor at a local FakePushshift server (instead of the real API), and redirects
+    all caches into a temporary directory.  Server behavior (latency, throttling, etc.) can be
+    tweaked via attributes on the yielded server object.
+    """
+    with FakePushshift() as server:
+        monkeypatch.setattr(config.extractors.reddit, 'url', server.url)
+        monkeypatch.setattr(rcm.extractors.reddit, 'limiter', TokenBucket(10_000))
+        monkeypatch.setattr(paths, 'data', tmp_path / 'data')
+        yield server
+
+
 def _get_worker_suffix(worker_id):
     return '0' if worker_id == 'master' else worker_id[-1]
@@ -0,0 +1,141 @@
+import pandas as pd
+import pyarrow.parquet
+from contextlib import closing
+from datetime import date
+from pandas import DataFrame
+from rcm.core.cache import CacheManifest, DateCache, DateRangeCache, MemoCache
+from rcm.core.config import config
+from rcm.utils.date_utils import path_to_date
+
+
+
+def test_date_cache_checkpoint(tmp_path):
+    """Verify that checkpointed records survive a truncated append, and are cleaned up on seal."""
+    cache = DateCache(date(2021, 1, 1), tmp_path)
+    cache.append_partial([{'page': 0}, {'page': 1}])
+    cache.append_partial([{'page': 2}])
+
+    # Simulate a crash mid-append.
+    with open(cache.partial_path, 'ab') as file:
+        file.write(b'\x1f\x8b\x08\x00garbage')
+    assert cache.load_partial() == [{'page': 0}, {'page': 1}, {'page': 2}]
+
+    # Appending after recovery must remain readable.
+    cache.append_partial([{'page': 3}])
+    assert len(cache.load_partial()) == 4
+
+    cache.seal(cache.load_partial())
+    assert not cache.partial_path.is_file()
+    assert cache.load() == [{'page': 0}, {'page': 1}, {'page': 2}, {'page': 3}]
+
+
+def test_cache_manifest(tmp_path):
+    """Verify that saved caches are recorded in the manifest, and can be pruned by date range."""
+    for day in range(1, 6):
+        DateCache(date(2021, 1, day), tmp_path).save([{'rows': day}], rows=day)
+    manifest = CacheManifest(tmp_path)
+    entries = manifest.query('.json.gz', date(2021, 1, 2), date(2021, 1, 4))
+    assert [x['min_date'] for x in entries] == [date(2021, 1, 2), date(2021, 1, 3), date(2021, 1, 4)]
+    assert [x['rows'] for x in entries] == [2, 3, 4]
+    assert all(x['bytes'] > 0 and len(x['checksum']) == 32 for x in entries)
+
+    # A rebuilt manifest finds the same files.
+    manifest.path.unlink()
+    manifest.rebuild('*.json.gz', lambda x: (path_to_date(x), path_to_date(x)))
+    assert len(manifest.query('.json.gz')) == 5
+
+
+def test_date_range_cache_manifest(tmp_path):
+    """Verify that overwriting a date range cache replaces its manifest entry."""
+    cache = DateRangeCache.from_prefix(tmp_path / 'symbol=MSFT')
+    df = DataFrame({'date': pd.to_datetime(['2021-01-01', '2021-01-02'])})
+    cache.overwrite(df, 'date')
+    cache.overwrite(pd.concat([df, DataFrame({'date': pd.to_datetime(['2021-01-03'])})]), 'date')
+    entries = CacheManifest(tmp_path).query()
+    assert len(entries) == 1
+    assert entries[0]['path'] == 'symbol=MSFT/min_date=2021-01-01, max_date=2021-01-03.snappy.parquet'
+    assert entries[0]['rows'] == 3
+
+
+def test_date_range_cache_parts(tmp_path, monkeypatch):
+    """Verify that appends write new parts, and that too many parts are compacted in the background."""
+    monkeypatch.setattr(config.caches, 'max_parts', 3)
+    cache = DateRangeCache.from_prefix(tmp_path / 'symbol=MSFT')
+    for day in range(1, 4):
+        cache.append(DataFrame({'date': pd.to_datetime([f'2021-01-0{day}']), 'value': [day]}), 'date')
+    assert sorted(x.name for x in cache.prefix.glob('*.parquet')) == [
+        'min_date=2021-01-01, max_date=2021-01-01.snappy.parquet',
+        'min_date=2021-01-02, max_date=2021-01-02, part=1.snappy.parquet',
+        'min_date=2021-01-03, max_date=2021-01-03, part=2.snappy.parquet',
+    ]
+
+    # Parts are read as one dataset.
+    cache = DateRangeCache.from_prefix(cache.prefix)
+    assert (cache.min_date, cache.max_date) == (date(2021, 1, 1), date(2021, 1, 3))
+    assert cache.load()['value'].tolist() == [1, 2, 3]
+
+    # The next append exceeds `max_parts`, so the cache is compacted.  (Parts a compaction supersedes are ignored.)
+    cache.append(DataFrame({'date': pd.to_datetime(['2021-01-04']), 'value': [4], 'extra': ['x']}), 'date')
+    cache.compact_in_background().result()
+    assert [x.name for x in cache.prefix.glob('*.parquet')] == ['min_date=2021-01-01, max_date=2021-01-04, part=0-3.snappy.parquet']
+    assert [x['path'] for x in CacheManifest(tmp_path).query()] == ['symbol=MSFT/min_date=2021-01-01, max_date=2021-01-04, part=0-3.snappy.parquet']
+    pd.DataFrame({'date': pd.to_datetime(['2021-01-01']), 'value': [1]}).to_parquet(cache.prefix / 'min_date=2021-01-01, max_date=2021-01-01, part=1.snappy.parquet')
+    df = DateRangeCache.from_prefix(cache.prefix).load()
+    assert df['value'].tolist() == [1, 2, 3, 4]
+    assert df['extra'].tolist() == [None, None, None, 'x']
+
+
+def test_date_range_cache_pushdown(tmp_path, monkeypatch):
+    """Verify that loads can project columns and filter dates, and that writers sort rows into small row groups by date."""
+    monkeypatch.setattr(config.caches, 'row_group_rows', 2)
+    cache = DateRangeCache.from_prefix(tmp_path / 'symbol=MSFT')
+    df = DataFrame({'created_date': pd.to_datetime(['2021-01-04', '2021-01-01', '2021-01-03', '2021-01-02']), 'text': list('dacb'), 'value': [4, 1, 3, 2]})
+    cache.append(df, 'created_date')
+
+    # Each row group covers a narrow date range.
+    metadata = pyarrow.parquet.ParquetFile(cache.parts[0]).metadata
+    assert metadata.num_row_groups == 2
+    assert metadata.row_group(1).column(0).statistics.min == pd.Timestamp('2021-01-03')
+
+    # Project and filter.
+    df = cache.load(columns=['value'], min_date=date(2021, 1, 2), max_date=date(2021, 1, 3))
+    assert df.columns.tolist() == ['value']
+    assert df['value'].tolist() == [2, 3]
+
+    # Columns missing from every part are returned as nulls.
+    df = cache.load(columns=['zoltan', 'value'], min_date=date(2021, 1, 2))
+    assert df.columns.tolist() == ['zoltan', 'value']
+    assert df['zoltan'].isnull().all()
+    assert df['value'].tolist() == [2, 3, 4]
+
+
+def test_memo_cache(tmp_path):
+    """Verify memo lookups, namespace isolation, hit-rate stats and least-recently-used eviction."""
+    memo = MemoCache(tmp_path / 'memo.sqlite', 'test', max_rows=10)
+    memo.touch_seconds = 0
+    memo.put_many({MemoCache.hash(str(i)): (i, i / 2) for i in range(10)})
+    assert memo.get_many([MemoCache.hash('3'), MemoCache.hash('x')]) == {MemoCache.hash('3'): (3, 1.5)}
+    assert memo.hit_rate() == 0.5
+    assert MemoCache(tmp_path / 'memo.sqlite', 'other', max_rows=10).get_many([MemoCache.hash('3')]) == {}
+
+    # Exceeding capacity evicts the least-recently-used rows, but keeps recently-used ones.
+    memo.put_many({MemoCache.hash('new'): (0, 0)})
+    assert memo.stats['evictions'] == 2
+    assert len(memo.get_many([MemoCache.hash(str(i)) for i in range(10)])) == 8
+    assert len(memo.get_many([MemoCache.hash('3'), MemoCache.hash('new')])) == 2
+
+
+def test_memo_cache_row_count(tmp_path):
+    """Verify that the stored row count tracks inserts, repeated keys and evictions, and that recent hits aren't re-written."""
+    memo = MemoCache(tmp_path / 'memo.sqlite', 'test', max_rows=100)
+    memo.put_many({str(i): (i,) for i in range(60)})
+    memo.put_many({str(i): (i,) for i in range(30, 90)})
+    memo.put_many({str(i): (i,) for i in range(90, 120)})
+    with closing(memo._connect()) as connection:
+        assert connection.execute("select value from meta where key = 'rows'").fetchone()[0] == 90
+        assert connection.execute('select count(*) from memo').fetchone()[0] == 90
+        used = connection.execute("select used from memo where key = '95'").fetchone()[0]
+    assert memo.stats['evictions'] == 30
+    assert memo.get_many(['95']) == {'95': (95,)}
+    with closing(memo._connect()) as connection:
+        assert connection.execute("select used from memo where key = '95'").fetchone()[0] == used
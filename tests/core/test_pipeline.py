@@ -0,0 +1,46 @@
+import pytest
+import threading
+import time
+from rcm.core.pipeline import Pipeline, Stage
+
+
+
+def test_pipeline():
+    """Verify that independent stages run concurrently, that downstream stages start before queued upstream ones, and that failures propagate."""
+    order = []
+    lock = threading.Lock()
+
+    def sleep(name: str, seconds: float, result=None):
+        def func(data):
+            with lock:
+                order.append(name)
+            time.sleep(seconds)
+            return result if result is not None else name
+        return func
+
+    # Two chains of (extract, transform), then a join.  Stages sleep 0.2 s each.
+    stages = [
+        Stage('extract_a', sleep('extract_a', 0.2), [], 'a'),
+        Stage('extract_b', sleep('extract_b', 0.2), [], 'b'),
+        Stage('extract_c', sleep('extract_c', 0.2), [], 'c'),
+        Stage('transform_a', sleep('transform_a', 0.2), ['a'], 'ta'),
+        Stage('join', lambda data: data['ta'] + data['b'] + data['c'], ['ta', 'b', 'c'], 'joined'),
+    ]
+    start_time = time.perf_counter()
+    data = Pipeline(stages, workers=2).run()
+    assert time.perf_counter() - start_time < 0.7
+    assert data['joined'] == 'transform_aextract_bextract_c'
+    assert order.index('transform_a') < order.index('extract_c')
+
+    # Bad graphs are rejected.
+    with pytest.raises(Exception, match='not produced'):
+        Pipeline([Stage('x', sleep('x', 0), ['missing'], 'x')], workers=1)
+    with pytest.raises(Exception, match='cyclically'):
+        Pipeline([Stage('x', sleep('x', 0), ['y'], 'x'), Stage('y', sleep('y', 0), ['x'], 'y')], workers=1)
+
+    # Failures propagate, and downstream stages never start.
+    stages = [Stage('fail', lambda data: 1 / 0, [], 'a'), Stage('after', sleep('after', 0), ['a'], 'b')]
+    order.clear()
+    with pytest.raises(ZeroDivisionError):
+        Pipeline(stages, workers=2).run()
+    assert order == []
@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
+from rcm.core.cache import CacheManifest, DateCache
+from rcm.core.config import config
 from rcm.extractors.reddit import RedditExtractor
 
 
@@ -15,3 +17,67 @@ def test_reddit_extractor():
         for name, word, min_time, max_time in time_intervals
     }
     assert len(results['[A, C]']) == len(results['[A, B]']) + len(results['[B, C]'])
+
+
+def test_reddit_extractor_local(pushshift, monkeypatch):
+    """Verify that sequential and adaptive pagination both return exactly what the (local) API holds, including rows on window edges."""
+    monkeypatch.setattr(config.extractors.reddit, 'windows', 24)
+    min_time = datetime(2021, 1, 1)
+    max_time = datetime(2021, 1, 2)
+    pushshift.rows_per_hour = 300
+    expected = pushshift.search('comment', {'q': 'cardano', 'after': int(min_time.timestamp()), 'before': int(max_time.timestamp()), 'size': 10**9})
+
+    sequential = RedditExtractor()._extract_date('comment', ('word', 'cardano'), None, min_time, max_time)
+    adaptive = RedditExtractor()._extract_date_adaptive('comment', ('word', 'cardano'), None, min_time, max_time)
+
+    for results in [sequential, adaptive]:
+        ids = [x['id'] for result in results for x in result['response']['json']['data']]
+        assert len(ids) == len(set(ids))
+        assert set(ids) == {x['id'] for x in expected}
+
+
+def test_reddit_extractor_compaction(pushshift, monkeypatch):
+    """Verify that reading compacted (columnar) caches returns the same data as reading raw JSON caches."""
+    extractor = RedditExtractor()
+
+    # Freshly-extracted days are compacted from memory, without reading the sealed JSON back.
+    loads = []
+    load = DateCache.load
+    monkeypatch.setattr(DateCache, 'load', lambda self: loads.append(self) or load(self))
+    caches = extractor.extract('comment', ('word', 'cardano'), None, date(2021, 1, 1), date(2021, 1, 2))
+    assert all(x.columnar_path.is_file() for x in caches)
+    assert loads == []
+    df_compacted = extractor.read('comment', ('word', 'cardano'), None, caches=caches)
+
+    for cache in caches:
+        cache.columnar_path.unlink()
+    df_raw = extractor.read('comment', ('word', 'cardano'), None, caches=caches)
+
+    assert len(df_compacted) > 0
+    assert df_compacted.equals(df_raw)
+
+    # A mix of compacted and raw days still comes back in `caches` order.
+    extractor._compact(caches[1])
+    df_mixed = extractor.read('comment', ('word', 'cardano'), None, caches=caches)
+    assert df_mixed.equals(df_raw)
+
+
+def test_reddit_extractor_manifest(pushshift):
+    """Verify that reading without cache objects finds (and prunes) day partitions via the manifest."""
+    extractor = RedditExtractor()
+    caches = extractor.extract('comment', ('word', 'cardano'), None, date(2021, 1, 1), date(2021, 1, 3))
+    df_expected = extractor.read('comment', ('word', 'cardano'), None, caches=caches[1:])
+    df_manifest = extractor.read('comment', ('word', 'cardano'), None, min_date=date(2021, 1, 2), max_date=date(2021, 1, 3))
+    assert df_manifest.equals(df_expected)
+
+
+def test_reddit_extractor_manifest_backfill(pushshift):
+    """Verify that a manifest first created by a save on an existing cache tree is completed (not trusted) on read."""
+    extractor = RedditExtractor()
+    caches = extractor.extract('comment', ('word', 'cardano'), None, date(2021, 1, 1), date(2021, 1, 3))
+    CacheManifest(caches[0].prefix).path.unlink()
+    caches += extractor.extract('comment', ('word', 'cardano'), None, date(2021, 1, 4), date(2021, 1, 4))
+    df_expected = extractor.read('comment', ('word', 'cardano'), None, caches=caches)
+    df_manifest = extractor.read('comment', ('word', 'cardano'), None, min_date=date(2021, 1, 1), max_date=date(2021, 1, 4))
+    assert len(df_manifest) > 0
+    assert df_manifest.equals(df_expected)
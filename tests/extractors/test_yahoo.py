@@ -1,6 +1,14 @@
+import numpy
+import pandas as pd
+import pytest
 import shutil
+from datetime import date
+from pandas import DataFrame
+from rcm.core.cache import CacheManifest, DateRangeCache
 from rcm.core.config import paths
+from rcm.extractors import yahoo
 from rcm.extractors.yahoo import YahooFinanceExtractor
+from tests.fakes.yahoo import FakeYahoo
 
 
 def test_yahoo_extractor():
@@ -14,3 +22,74 @@ def test_yahoo_extractor():
     assert round(df.loc['2018-12-31']['open'], 2) ==  97.31
     assert round(df.loc['2019-12-31']['open'], 2) == 152.84
     assert round(df.loc['2020-12-31']['open'], 2) == 218.43
+
+
+def test_yahoo_extractor_manifest_backfill(tmp_path, monkeypatch):
+    """Verify that reading via a manifest first created by a save on an existing cache tree still finds every symbol."""
+    monkeypatch.setattr(paths, 'data', tmp_path)
+    prefix = tmp_path / 'yahoo_finance_price_history'
+    df = DataFrame({'Date': pd.to_datetime(['2021-01-01', '2021-01-02']), 'Open': [1.0, 2.0]})
+    for symbol in ['MSFT', 'AAPL']:
+        DateRangeCache.from_prefix(prefix / f'symbol={symbol}').overwrite(df.assign(symbol=symbol), 'Date')
+    CacheManifest(prefix).path.unlink()
+    DateRangeCache.from_prefix(prefix / 'symbol=GOOG').overwrite(df.assign(symbol='GOOG'), 'Date')
+    df = YahooFinanceExtractor()._read()
+    assert sorted(df['symbol'].unique()) == ['AAPL', 'GOOG', 'MSFT']
+
+
+def test_yahoo_extractor_incremental(tmp_path, monkeypatch):
+    """Verify that daily runs fetch only the last few days, and that corporate actions and restated prices trigger a full refresh."""
+    monkeypatch.setattr(paths, 'data', tmp_path)
+    fake = FakeYahoo(today=date(2021, 1, 11))
+    monkeypatch.setattr(yahoo, 'yf', fake)
+    monkeypatch.setattr(yahoo, 'date', type('FakeDate', (date,), {'today': classmethod(lambda cls: fake.today)}))
+
+    # Run on given date, then return the API calls made, and the cached history.
+    def run(today: date):
+        fake.today = today
+        fake.calls.clear()
+        df = YahooFinanceExtractor().extract(symbols=['MSFT'], read=True)
+        return [x[1:] for x in fake.calls], df
+
+    # The first run fetches the full history.  The next fetches 5 days of overlap plus 2 new days.
+    calls, df = run(date(2021, 1, 11))
+    assert calls == [('max', None, None)]
+    assert df['date'].max().date() == date(2021, 1, 10)
+    calls, df = run(date(2021, 1, 13))
+    assert calls == [(None, date(2021, 1, 5), date(2021, 1, 13))]
+    assert df['date'].is_unique
+    assert df['date'].max().date() == date(2021, 1, 12)
+    assert numpy.allclose(df['close'], fake.prices['MSFT'].loc[:'2021-01-12', 'Close'])
+
+    # Nothing is fetched twice in a day.
+    assert run(date(2021, 1, 13))[0] == []
+
+    # A dividend triggers a full refresh.
+    fake.prices['MSFT'].loc['2021-01-13', 'Dividends'] = 1
+    assert run(date(2021, 1, 14))[0] == [(None, date(2021, 1, 7), date(2021, 1, 14)), ('max', None, None)]
+
+    # So does a restated price.
+    fake.prices['MSFT'].loc['2021-01-12', 'Close'] += 1
+    calls, df = run(date(2021, 1, 15))
+    assert calls == [(None, date(2021, 1, 8), date(2021, 1, 15)), ('max', None, None)]
+    assert numpy.allclose(df['close'], fake.prices['MSFT'].loc[:'2021-01-14', 'Close'])
+
+
+def test_yahoo_extractor_concurrent(tmp_path, monkeypatch):
+    """Verify that symbols are extracted concurrently, and that one symbol's failure doesn't affect the others."""
+    monkeypatch.setattr(paths, 'data', tmp_path)
+    fake = FakeYahoo(today=date(2021, 1, 11))
+    fake.failing = {'DELISTED'}
+    monkeypatch.setattr(yahoo, 'yf', fake)
+    monkeypatch.setattr(yahoo, 'date', type('FakeDate', (date,), {'today': classmethod(lambda cls: fake.today)}))
+    symbols = [f'SYM{i}' for i in range(20)] + ['DELISTED']
+
+    # Extract.
+    extractor = YahooFinanceExtractor()
+    df = extractor.extract(symbols=symbols, read=True)
+    assert sorted(df['symbol'].unique()) == sorted(symbols[:-1])
+    assert list(extractor.failures) == ['DELISTED']
+
+    # If every symbol fails, raise.
+    with pytest.raises(Exception, match='All symbols failed'):
+        extractor.extract(symbols=['DELISTED'])
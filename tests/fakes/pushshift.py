@@ -0,0 +1,160 @@
+import hashlib
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qsl, urlparse
+
+
+
+class FakePushshift:
+    """
+    A local stand-in for the Pushshift API.
+
+    Comments (and submissions) are generated deterministically from `(endpoint, search, hour)`, so
+    the same query always returns the same rows, no matter how the time range is paginated or split.
+
+    Args:
+        rows_per_hour (int):
+            Average number of rows generated per hour, per search.
+
+        latency (float):
+            Seconds added to every response.
+
+        throttle_rate (float):
+            Fraction of requests answered with HTTP 429 (Too Many Requests).
+
+        error_rate (float):
+            Fraction of requests answered with HTTP 500 (Internal Server Error).
+
+        retry_after (float):
+            `Retry-After` header (in seconds) included in throttled responses.
+
+        seed (int):
+            Seed for the throttle and error rolls.
+
+    Example:
+        >>> with FakePushshift(rows_per_hour=50) as server:
+        ...     requests.get(f'{server.url}/comment', params={'q': 'doge', 'after': 0, 'before': 3600})
+    """
+
+    def __init__(self, rows_per_hour: int = 50, latency: float = 0, throttle_rate: float = 0, error_rate: float = 0, retry_after: float = 0, seed: int = 0):
+        self.rows_per_hour: int = rows_per_hour
+        self.latency: float = latency
+        self.throttle_rate: float = throttle_rate
+        self.error_rate: float = error_rate
+        self.retry_after: float = retry_after
+        self.random: random.Random = random.Random(seed)
+        self.stats: Dict[str, int] = {'requests': 0, 'throttled': 0, 'errors': 0, 'rows': 0}
+        self.lock: threading.Lock = threading.Lock()
+        self.server: ThreadingHTTPServer = None
+
+    def __enter__(self) -> 'FakePushshift':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server.server_port}/reddit/search'
+
+    def start(self) -> 'FakePushshift':
+        """Starts serving on an ephemeral localhost port, in a background thread."""
+        fake = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+            def do_GET(self):
+                fake._handle(self)
+            def log_message(self, *args):
+                pass
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, endpoint: str, params: Dict[str, str]) -> List[dict]:
+        """Returns the rows Pushshift would return for the given query parameters."""
+        search = ('subreddit', params['subreddit']) if 'subreddit' in params else ('word', params.get('q'))
+        after = int(params['after'])
+        before = int(params['before'])
+        size = int(params.get('size', 25))
+        min_score = int(params['score'][1:]) if 'score' in params else None
+        rows = [
+            row
+            for hour in range(after // 3600, before // 3600 + 1)
+            for row in _generate(endpoint, search, hour, self.rows_per_hour)
+            if after < row['created_utc'] < before and (min_score is None or row['score'] > min_score)
+        ]
+        return rows[:size]
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        url = urlparse(request.path)
+        params = dict(parse_qsl(url.query))
+        endpoint = url.path.rstrip('/').split('/')[-1]
+
+        # Roll for latency, throttling and errors.
+        time.sleep(self.latency)
+        with self.lock:
+            self.stats['requests'] += 1
+            roll = self.random.random()
+            throttled = roll < self.throttle_rate
+            failed = not throttled and roll < self.throttle_rate + self.error_rate
+            self.stats['throttled'] += int(throttled)
+            self.stats['errors'] += int(failed)
+
+        if throttled:
+            self._respond(request, 429, {'error': 'Too Many Requests'}, {'Retry-After': str(self.retry_after)})
+        elif failed:
+            self._respond(request, 500, {'error': 'Internal Server Error'})
+        else:
+            rows = self.search(endpoint, params)
+            with self.lock:
+                self.stats['rows'] += len(rows)
+            self._respond(request, 200, {'data': rows})
+
+    def _respond(self, request: BaseHTTPRequestHandler, status: int, body: dict, headers: Dict[str, str] = None):
+        content = json.dumps(body).encode('utf-8')
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(content)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(content)
+
+
+@lru_cache(maxsize=100_000)
+def _generate(endpoint: str, search: tuple, hour: int, rows_per_hour: int) -> List[dict]:
+    """Deterministically generates all rows posted within the given hour, sorted by `created_utc`."""
+    seed = int(hashlib.md5(f'{endpoint}|{search[0]}|{search[1]}|{hour}'.encode('utf-8')).hexdigest()[:16], 16)
+    rng = random.Random(seed)
+    count = rng.randint(0, 2 * rows_per_hour)
+    words = ['moon', 'hodl', 'dip', 'scam', 'lambo', 'rekt', 'bullish', 'bearish', 'great', 'terrible', '🚀']
+    rows = []
+    for k in range(count):
+        text = ' '.join([search[1]] + rng.choices(words, k=rng.randint(3, 12)))
+        rows += [{
+            'id': f'{seed % 10**8:08d}{k:04d}',
+            'created_utc': hour * 3600 + rng.randrange(3600),
+            'author': f'user{rng.randrange(1000)}',
+            'subreddit': search[1] if search[0] == 'subreddit' else rng.choice(['CryptoCurrency', 'wallstreetbets', 'dogecoin']),
+            'title': text if endpoint == 'submission' else None,
+            'body': text if endpoint == 'comment' else None,
+            'score': rng.randint(-5, 100),
+        }]
+    return sorted(rows, key=lambda x: x['created_utc'])
+
+
+if __name__ == '__main__':
+    server = FakePushshift(latency=0.05).start()
+    print(f'Serving at:  {server.url}')
+    threading.Event().wait()
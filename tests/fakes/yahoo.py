@@ -0,0 +1,61 @@
+import numpy
+import pandas as pd
+from datetime import date
+from pandas import DataFrame
+
+
+
+class FakeYahoo:
+    """
+    A local stand-in for the `yfinance` module.
+
+    Each symbol's daily price history is generated deterministically, from 2020-01-01 through
+    `today`.  Tests can then edit `prices` to simulate corporate actions or restated prices.  Each
+    call to `Ticker.history` is recorded in `calls`, and calls for symbols in `failing` raise.
+
+    Example:
+        >>> monkeypatch.setattr(rcm.extractors.yahoo, 'yf', FakeYahoo(today=date(2021, 1, 11)))
+    """
+
+    def __init__(self, today: date):
+        self.today: date = today
+        self.prices: dict = {}
+        self.calls: list = []
+        self.failing: set = set()
+
+    def Ticker(self, symbol: str) -> 'FakeTicker':
+        if symbol not in self.prices:
+            dates = pd.date_range('2020-01-01', '2022-12-31', name='Date')
+            close = 100 + numpy.random.default_rng(len(self.prices)).normal(size=len(dates)).cumsum()
+            self.prices[symbol] = DataFrame({
+                'Open': close - 1,
+                'High': close + 1,
+                'Low': close - 2,
+                'Close': close,
+                'Volume': 1000,
+                'Dividends': 0,
+                'Stock Splits': 0,
+            }, index=dates)
+        return FakeTicker(self, symbol)
+
+
+
+class FakeTicker:
+
+    def __init__(self, yahoo: FakeYahoo, symbol: str):
+        self.yahoo: FakeYahoo = yahoo
+        self.symbol: str = symbol
+
+    def history(self, period: str = None, start: date = None, end: date = None) -> DataFrame:
+        """Returns daily bars within `[start, end)`, or for all days (through today) if `period = max`."""
+        self.yahoo.calls += [(self.symbol, period, start, end)]
+        if self.symbol in self.yahoo.failing:
+            raise Exception(f'No data found, symbol may be delisted:  {self.symbol}.')
+        df = self.yahoo.prices[self.symbol]
+        dates = df.index.date
+        mask = dates <= self.yahoo.today
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates < end
+        return df[mask].copy()
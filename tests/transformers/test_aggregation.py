@@ -0,0 +1,95 @@
+import json
+import pandas as pd
+import shutil
+from datetime import date
+from pandas import DataFrame
+from rcm.core.cache import DateRangeCache
+from rcm.core.config import config, paths
+from rcm.transformers.aggregation import AggregationTransformer
+from rcm.utils.profile_utils import get_report_path
+
+
+
+def test_aggregation_transformer_incremental(tmp_path, monkeypatch):
+    """Extends the aggregate cache by a few days, and checks that only new (and restated) dates are read, and that the result matches a full rebuild."""
+    monkeypatch.setattr(paths, 'data', tmp_path / 'data')
+    monkeypatch.setattr(config.transformers.sentiment, 'engines', ['vader', 'textblob'])
+    monkeypatch.setattr(config.transformers.aggregation, 'restatement_days', 2)
+    monkeypatch.setattr(config.transformers.aggregation, 'workers', 1)
+    monkeypatch.setattr(config.extractors.reddit, 'min_date', date(2020, 1, 1))
+
+    # Fake sentiment caches, one row per day, for two queries.
+    def get_data(max_day: int):
+        data = {'reddit_comments_sentiment': {}, 'reddit_submissions_sentiment': {}}
+        for i, search in enumerate([('word', 'zoltan'), ('subreddit', 'zoltan')]):
+            prefix = tmp_path / 'sentiment' / f'{search[0]}={search[1]}'
+            shutil.rmtree(prefix, ignore_errors=True)
+            days = pd.date_range('2020-01-01', f'2020-01-{max_day:02}')
+            DateRangeCache.from_prefix(prefix).overwrite(DataFrame({
+                'created_date': days,
+                'body': '🚀 zoltan',
+                'score': range(i + 1, i + 1 + len(days)),
+                **{x: 0.5 for x in ['negative', 'neutral', 'positive', 'compound', 'polarity', 'subjectivity']},
+            }), 'created_date')
+            data['reddit_comments_sentiment'][search] = DateRangeCache.from_prefix(prefix)
+        return data
+
+    # Spy on sentiment loads.
+    loads = []
+    load = DateRangeCache.load
+    monkeypatch.setattr(DateRangeCache, 'load', lambda self, *args, **kwargs: loads.append(kwargs.get('min_date')) or load(self, *args, **kwargs))
+
+    # Aggregate 10 days, then 12 days.
+    monkeypatch.setattr(config.extractors.reddit, 'max_date', date(2020, 1, 10))
+    AggregationTransformer().transform(get_data(10))
+    loads.clear()
+    monkeypatch.setattr(config.extractors.reddit, 'max_date', date(2020, 1, 12))
+    df = AggregationTransformer().transform(get_data(12))
+    assert loads == [None, date(2020, 1, 9), date(2020, 1, 9)]
+
+    # Validate against a full rebuild.
+    shutil.rmtree(AggregationTransformer()._get_cache_prefix())
+    df_full = AggregationTransformer().transform(get_data(12))
+    assert len(df) == 24
+    assert df.equals(df_full)
+
+    # Validate against a full rebuild across a process pool.  (Workers' cache reads count toward the profile.)
+    shutil.rmtree(AggregationTransformer()._get_cache_prefix())
+    monkeypatch.setattr(config.transformers.aggregation, 'workers', 2)
+    monkeypatch.setattr(config.profile, 'enabled', True)
+    assert AggregationTransformer().transform(get_data(12)).equals(df_full)
+    profile = json.loads(get_report_path().read_text().splitlines()[-1])
+    assert profile['name'] == 'AggregationTransformer.transform'
+    assert profile['rows_read'] == 24
+
+
+def test_aggregation_transformer_new_engine(tmp_path, monkeypatch):
+    """Adds engines after a sentiment cache was written, and checks that old rows aggregate with null scores for them."""
+    monkeypatch.setattr(paths, 'data', tmp_path / 'data')
+    monkeypatch.setattr(config.transformers.aggregation, 'workers', 1)
+    monkeypatch.setattr(config.extractors.reddit, 'min_date', date(2020, 1, 1))
+    monkeypatch.setattr(config.extractors.reddit, 'max_date', date(2020, 1, 3))
+
+    # Vader-only rows for 2 days, then a part scored by all engines for day 3.
+    cache = DateRangeCache.from_prefix(tmp_path / 'sentiment' / 'word=zoltan')
+    cache.append(DataFrame({
+        'created_date': pd.to_datetime(['2020-01-01', '2020-01-02']),
+        'body': '🚀🚀 zoltan',
+        'score': [1, 2],
+        **{x: 0.5 for x in ['negative', 'neutral', 'positive', 'compound']},
+    }), 'created_date')
+    cache.append(DataFrame({
+        'created_date': pd.to_datetime(['2020-01-03']),
+        'body': '🚀🚀 zoltan',
+        'score': [3],
+        **{x: 0.5 for x in ['negative', 'neutral', 'positive', 'compound', 'polarity', 'subjectivity']},
+        'rockets': [5],
+    }), 'created_date')
+
+    # Aggregate with engines added.
+    monkeypatch.setattr(config.transformers.sentiment, 'engines', ['vader', 'textblob', 'rockets'])
+    data = {'reddit_comments_sentiment': {('word', 'zoltan'): DateRangeCache.from_prefix(cache.prefix)}, 'reddit_submissions_sentiment': {}}
+    df = AggregationTransformer().transform(data)
+    assert df['num_rockets'].tolist() == [2, 2, 5]
+    assert df['wavg_compound'].tolist() == [0.5, 0.5, 0.5]
+    assert df['wavg_polarity'].isnull().tolist() == [True, True, False]
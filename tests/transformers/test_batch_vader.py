@@ -0,0 +1,29 @@
+import numpy
+import random
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+from rcm.transformers.batch_vader import BatchVader
+
+
+
+def test_batch_vader_parity():
+    """Verify that BatchVader matches Vader (within its documented tolerance), on both the fast path and the fallback path."""
+    sia = SentimentIntensityAnalyzer()
+    batch_vader = BatchVader(sia)
+
+    # Random comments, mixing plain lexicon words, ALL CAPS, punctuation, emoticons, emojis and modifiers.
+    rng = random.Random(0)
+    words = [
+        'moon', 'hodl', 'dip', 'scam', 'lambo', 'rekt', 'bullish', 'great', 'terrible', 'GREAT', 'I', 'love', 'hate',
+        'this', 'is', 'the', 'bomb', 'very', 'not', "don't", 'but', ':)', 'good!', 'bad??', 'wow!!!', 'LOL', 'kind',
+        'of', 'no', 'problem', 'sad.', '...', '🚀', 'happy😀', 'to', 'die', 'for', 'least', 'at', 'never', 'so',
+    ]
+    texts = [' '.join(rng.choices(words, k=rng.randint(0, 20))) for _ in range(2000)]
+    texts += ['', '   ', '!!!', '???', 'GREAT', 'great GREAT', 'i like this great thing', 'a b this great', 'the bomb', 'kiss of death']
+
+    expected = numpy.array([[x['neg'], x['neu'], x['pos'], x['compound']] for x in map(sia.polarity_scores, texts)])
+    actual = batch_vader.polarity_scores(texts)
+    assert actual.shape == (len(texts), 4)
+    assert numpy.abs(actual[:, :3] - expected[:, :3]).max() <= 1e-3
+    assert numpy.abs(actual[:, 3] - expected[:, 3]).max() <= 1e-4
+    assert 0 < batch_vader.stats['fallbacks'] < batch_vader.stats['texts']
+    assert len(batch_vader.polarity_scores([])) == 0
@@ -0,0 +1,41 @@
+import pandas as pd
+from pandas import DataFrame
+from rcm.transformers.densify import DensifyTransformer
+
+
+
+def test_densify_calendar():
+    """Verify that the calendar covers each symbol's available dates, and that features are aligned onto it by key."""
+    transformer = DensifyTransformer()
+    data = {}
+    data['dt_available_dates'] = DataFrame({
+        'symbol_id': ['BTC', 'ETH', 'DOGE'],
+        'yahoo_symbol': ['BTC-USD', 'ETH-USD', 'DOGE-USD'],
+        'min_available_date': pd.to_datetime(['2021-01-01', '2021-01-03', None]),
+        'max_available_date': pd.to_datetime(['2021-01-03', '2021-01-04', None]),
+        'available_days': [3, 2, None],
+    })
+    data['dt_calendar'] = transformer._get_df_calendar(data)
+    assert data['dt_calendar']['symbol_id'].tolist() == ['BTC', 'BTC', 'BTC', 'ETH', 'ETH']
+    assert data['dt_calendar']['date'].dt.day.tolist() == [1, 2, 3, 3, 4]
+
+    # Features are joined by key.  Missing dates are null.
+    data['yahoo_finance_price_history'] = DataFrame({
+        'symbol': ['ETH-USD', 'BTC-USD', 'BTC-USD'],
+        'date': pd.to_datetime(['2021-01-04', '2021-01-01', '2021-01-03']),
+        'close': [4.0, 1.0, 3.0],
+    })
+    data['dt_reddit_staging'] = DataFrame({
+        'symbol_id': ['ETH', 'BTC'],
+        'endpoint': ['comment', 'comment'],
+        'created_date': pd.to_datetime(['2021-01-03', '2021-01-02']),
+        'sum_score': [10, 20],
+        'wsum_compound': [5.0, 5.0],
+        'wavg_compound': [0.5, 0.25],
+    })
+    df = transformer._get_df_features(data)
+    assert df['p_close'].fillna(0).tolist() == [1.0, 0, 3.0, 0, 4.0]
+    assert df['pa_close'].fillna(0).tolist() == [1.0, 0, 3.0, 3.0, 4.0]
+    assert df['rc_sum_score'].fillna(0).tolist() == [0, 20, 0, 10, 0]
+    assert df['rca_wavg_compound'].fillna(0).tolist() == [0, 0.25, 0.5, 0.5, 0]
+    assert df['rs_sum_score'].isnull().all()
@@ -1,8 +1,12 @@
+import pytest
 import shutil
 from datetime import date
-from rcm.core.config import paths
+from functools import partial
+from rcm.core.config import config, paths
 from rcm.extractors.reddit import RedditExtractor
+from rcm.transformers import sentiment
 from rcm.transformers.sentiment import SentimentTransformer
+from rcm.utils.date_utils import epoch_to_est_date
 
 
 
@@ -52,3 +56,118 @@ def test_sentiment_transformer():
     # Clean up.
     for path in cache_prefixes:
         shutil.rmtree(path)
+
+
+def test_sentiment_transformer_local(pushshift):
+    """Runs RedditExtractor and SentimentTransformer against a local FakePushshift server, in small chunks, then extends the cache by one day."""
+
+    # Extract and transform, one day per chunk.
+    caches = RedditExtractor().extract('comment', ('word', 'zoltan'), None, date(2020, 1, 1), date(2020, 1, 3))
+    range_cache = SentimentTransformer().transform('comment', ('word', 'zoltan'), None, caches, chunk_size=1e-6)
+    df = range_cache.load()
+    assert len(df) == len(RedditExtractor().read('comment', ('word', 'zoltan'), None, caches=caches))
+    assert df['negative'].notnull().all()
+
+    # Extend by one day.  Old rows are kept, and only the new day is written, as a new part.
+    caches = RedditExtractor().extract('comment', ('word', 'zoltan'), None, date(2020, 1, 1), date(2020, 1, 4))
+    range_cache = SentimentTransformer().transform('comment', ('word', 'zoltan'), None, caches, chunk_size=1e-6)
+    df = range_cache.load()
+    assert len(df) == len(RedditExtractor().read('comment', ('word', 'zoltan'), None, caches=caches))
+    assert df['id'].is_unique
+    assert sorted(x.name for x in range_cache.prefix.glob('*.parquet')) == [
+        'min_date=2020-01-01, max_date=2020-01-03.snappy.parquet',
+        'min_date=2020-01-01, max_date=2020-01-04, part=1.snappy.parquet',
+    ]
+
+
+def test_sentiment_transformer_dedup(pushshift, monkeypatch):
+    """Transforms two queries matching the same items, and checks that each item is scored only once."""
+
+    # Count scored items.  (Persistent memo is disabled, so only the temporary, per-call memo can avoid re-scoring.)
+    scored = []
+    analyze_batch = sentiment._analyze_batch
+    monkeypatch.setattr(sentiment, '_analyze_batch', lambda rows, names: scored.extend(rows) or analyze_batch(rows, names))
+    monkeypatch.setattr(config.transformers.sentiment, 'memo', False)
+
+    # Both queries share the same extracted items.
+    caches = RedditExtractor().extract('comment', ('word', 'zoltan'), None, date(2020, 1, 1), date(2020, 1, 2))
+    queries = [
+        {'endpoint': 'comment', 'search': ('word', 'zoltan'), 'min_score': None},
+        {'endpoint': 'comment', 'search': ('subreddit', 'zoltan'), 'min_score': None},
+    ]
+    transformer = SentimentTransformer()
+    with transformer.deduplicating():
+        range_caches = {x['search']: transformer.transform(x['endpoint'], x['search'], x['min_score'], caches) for x in queries}
+
+    # Validate.
+    df = [range_caches[x['search']].load() for x in queries]
+    assert len(df[0]) == len(df[1]) > 0
+    assert len(scored) == df[0]['body'].nunique()
+    assert df[0][['id', 'negative', 'compound', 'polarity']].equals(df[1][['id', 'negative', 'compound', 'polarity']])
+
+    # Without dedup, every query scores its own items.
+    scored.clear()
+    monkeypatch.setattr(config.transformers.sentiment, 'dedup', False)
+    queries = [
+        {'endpoint': 'comment', 'search': ('word', 'zoltan2'), 'min_score': None},
+        {'endpoint': 'comment', 'search': ('subreddit', 'zoltan2'), 'min_score': None},
+    ]
+    with transformer.deduplicating():
+        for query in queries:
+            transformer.transform(query['endpoint'], query['search'], query['min_score'], caches)
+    assert len(scored) == 2 * df[0]['body'].nunique()
+
+
+def test_sentiment_pool():
+    """Verify that the worker pool is not forked from this (multi-threaded) process, and scores match in-process scores."""
+    inputs = [(0, 'zoltan moon lambo great'), (1, 'zoltan scam rekt terrible')]
+    names = config.transformers.sentiment.engines
+    try:
+        pool = sentiment.get_pool()
+        assert pool._ctx.get_start_method() in ['forkserver', 'spawn']
+        assert pool.map(partial(sentiment._analyze_batch, names=names), [inputs]) == [sentiment._analyze_batch(inputs, names)]
+    finally:
+        sentiment.close_pool()
+
+
+def test_sentiment_transformer_engines(pushshift, monkeypatch):
+    """Extends a cache scored by all engines with a Vader-only run, and checks that columns are unified."""
+    monkeypatch.setattr(config.transformers.sentiment, 'memo', False)
+    search = ('word', 'zoltan3')
+
+    # Score two days with all engines, then one more day with Vader only.
+    caches = RedditExtractor().extract('comment', search, None, date(2020, 1, 1), date(2020, 1, 2))
+    old_ids = set(SentimentTransformer().transform('comment', search, None, caches, chunk_size=1e-6).load()['id'])
+    caches = RedditExtractor().extract('comment', search, None, date(2020, 1, 1), date(2020, 1, 3))
+    range_cache = SentimentTransformer(engines=['vader']).transform('comment', search, None, caches, chunk_size=1e-6)
+
+    # Old rows keep their TextBlob scores.  New rows have nulls.
+    df = range_cache.load()
+    is_old = df['id'].isin(old_ids)
+    assert df['id'].is_unique
+    assert 0 < is_old.sum() < len(df)
+    assert df['compound'].notnull().all()
+    assert df.loc[is_old, 'polarity'].notnull().all()
+    assert df.loc[~is_old, 'polarity'].isnull().all()
+
+    # Compacting keeps both.
+    range_cache.compact()
+    assert range_cache.load().sort_values('id', ignore_index=True).equals(df.sort_values('id', ignore_index=True))
+    assert [x.name for x in range_cache.prefix.glob('*.parquet')] == ['min_date=2020-01-01, max_date=2020-01-03, part=0-1.snappy.parquet']
+
+    # Unknown engines are rejected.
+    with pytest.raises(Exception, match='Unknown sentiment engine'):
+        SentimentTransformer(engines=['vader', 'zoltan'])
+
+
+def test_sentiment_transformer_precision(pushshift, monkeypatch):
+    """Verify that compact data types never round `created_utc`, so sentiment rows keep their exact timestamps and dates."""
+    monkeypatch.setattr(config.dtypes, 'compact', True)
+    monkeypatch.setattr(config.transformers.sentiment, 'memo', False)
+    search = ('word', 'zoltan4')
+    caches = RedditExtractor().extract('comment', search, None, date(2020, 1, 1), date(2020, 1, 3))
+    df = SentimentTransformer().transform('comment', search, None, caches, chunk_size=1e-6).load().set_index('id')
+    raw = RedditExtractor()._read('comment', search, None, caches=caches).set_index('id').loc[df.index]
+    assert df['created_utc'].dtype == 'float64'
+    assert df['created_utc'].equals(raw['created_utc'].astype('float64'))
+    assert df['created_date'].equals(epoch_to_est_date(raw['created_utc'].astype('float64')).rename('created_date'))
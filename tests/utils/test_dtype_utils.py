@@ -0,0 +1,27 @@
+import pandas as pd
+from pandas import DataFrame
+from rcm.utils import dtype_utils
+from rcm.utils.dtype_utils import compact_dtypes
+
+
+
+def test_compact_dtypes(monkeypatch):
+    """Verify compact data types, and that the memory hook reports the savings."""
+    reports = []
+    monkeypatch.setattr(dtype_utils, 'memory_hooks', [lambda *x: reports.append(x)])
+    df = DataFrame({
+        'endpoint': ['comment', 'submission'] * 500,
+        'body': pd.array([f'zoltan {i}' for i in range(1000)], dtype='string'),
+        'created_date': pd.to_datetime('2021-01-01'),
+        'score': range(1000),
+        'big': [0, 2**40] * 500,
+        'compound': 0.5,
+        'created_utc': 1577836801.0,
+        'is_new': True,
+    })
+    compact = compact_dtypes(df, 'test')
+    assert compact.dtypes.astype(str).tolist() == ['category', 'string', 'datetime64[ns]', 'int32', 'int64', 'float32', 'float64', 'bool']
+    assert compact['body'].dtype.storage == 'pyarrow'
+    assert compact.astype(df.dtypes.to_dict()).equals(df)
+    assert reports[0][0] == 'test'
+    assert reports[0][2] < reports[0][1] / 2
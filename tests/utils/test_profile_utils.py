@@ -0,0 +1,73 @@
+import json
+import multiprocessing as mp
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import partial
+from pandas import DataFrame
+from rcm.core.cache import DateRangeCache
+from rcm.core.config import config, paths
+from rcm.utils.profile_utils import absorb, collect, get_report_path, profile, profiled
+from rcm.utils.thread_utils import thread_map
+
+
+
+def test_profile(tmp_path, monkeypatch):
+    """Verify that nested scopes are reported, and that cache I/O in worker threads counts toward the caller."""
+    monkeypatch.setattr(paths, 'data', tmp_path / 'data')
+    monkeypatch.setattr(config.profile, 'enabled', True)
+    monkeypatch.setattr(config.profile, 'cprofile', True)
+    df = DataFrame({'created_date': pd.date_range('2021-01-01', periods=100, freq='H'), 'score': range(100)})
+
+    @profiled('write')
+    def write(prefix: str) -> DataFrame:
+        DateRangeCache.from_prefix(tmp_path / 'data' / prefix, '.snappy.parquet').overwrite(df, 'created_date')
+        return DateRangeCache.from_prefix(tmp_path / 'data' / prefix, '.snappy.parquet').load(min_date=date(2021, 1, 3))
+
+    # Profile.
+    with profile('outer') as record:
+        results = thread_map(write, ['a', 'b', 'c'], 3)
+        record.rows_out = sum(len(x) for x in results)
+
+    # Validate report.
+    rows = {x['name']: x for x in map(json.loads, get_report_path().read_text().splitlines())}
+    assert set(rows) == {'write', 'outer'}
+    outer = rows['outer']
+    assert outer['rows_written'] == 300
+    assert outer['rows_read'] == outer['rows_in'] == outer['rows_out'] == 3 * 52
+    assert outer['bytes_written'] > 0 and outer['bytes_read'] > 0
+    assert outer['wall_seconds'] >= outer['cpu_seconds'] >= 0
+    assert outer['peak_rss_mb'] > 0
+    assert outer['error'] is None
+    assert len(list(get_report_path().parent.glob('*.outer.*.prof'))) == 1
+
+    # Errors are recorded, and I/O outside any scope is ignored.
+    try:
+        with profile('failed'):
+            raise ValueError('zoltan')
+    except ValueError:
+        pass
+    DateRangeCache.from_prefix(tmp_path / 'data' / 'd', '.snappy.parquet').overwrite(df, 'created_date')
+    rows = [json.loads(x) for x in get_report_path().read_text().splitlines()]
+    assert rows[-1]['name'] == 'failed'
+    assert rows[-1]['error'] == 'ValueError: zoltan'
+
+
+def test_profile_workers(tmp_path, monkeypatch):
+    """Verify that I/O and peak RSS of worker processes count toward the caller, via `collect` and `absorb`."""
+    monkeypatch.setattr(paths, 'data', tmp_path / 'data')
+    monkeypatch.setattr(config.profile, 'enabled', True)
+    cache = DateRangeCache.from_prefix(tmp_path / 'data' / 'a', '.snappy.parquet')
+    cache.overwrite(DataFrame({'created_date': pd.date_range('2021-01-01', periods=100, freq='H'), 'score': range(100)}), 'created_date')
+
+    # Load in worker processes.
+    with profile('outer'), ProcessPoolExecutor(max_workers=2, mp_context=mp.get_context('forkserver')) as executor:
+        for df, stats in executor.map(partial(collect, DateRangeCache.load), [cache, cache]):
+            assert len(df) == 100
+            absorb(stats)
+
+    # Validate report.
+    outer = json.loads(get_report_path().read_text().splitlines()[-1])
+    assert outer['rows_read'] == 200
+    assert outer['bytes_read'] > 0
+    assert outer['peak_rss_workers_mb'] > 0
@@ -0,0 +1,13 @@
+import time
+from rcm.utils.rate_utils import TokenBucket
+from rcm.utils.thread_utils import thread_map
+
+
+
+def test_token_bucket():
+    """Verify that many threads sharing one bucket never exceed its rate."""
+    limiter = TokenBucket(rate=20, capacity=1)
+    start_time = time.monotonic()
+    thread_map(lambda x: limiter.acquire(), range(21), workers=8)
+    elapsed_time = time.monotonic() - start_time
+    assert elapsed_time >= 0.95
@@ -0,0 +1,27 @@
+import threading
+import time
+from rcm.utils.request_utils import SessionPool
+from rcm.utils.thread_utils import thread_map
+
+
+
+def test_session_pool_max_sessions():
+    """Verify that many threads sharing one pool never hold more than `max_sessions` sessions."""
+    pool = SessionPool(max_sessions=2)
+    in_use = []
+    lock = threading.Lock()
+
+    def _use(i):
+        with pool.session() as session:
+            with lock:
+                in_use.append(session)
+                peak = len(set(in_use))
+            time.sleep(0.02)
+            with lock:
+                in_use.remove(session)
+            return peak
+
+    peaks = thread_map(_use, range(16), workers=8)
+    assert max(peaks) <= 2
+    assert pool.stats()['sessions'] == 2
+    pool.close()
@@ -0,0 +1,57 @@
+import time
+from types import SimpleNamespace
+from rcm.utils.retry_utils import retry_with_timeout, retry_stats
+
+
+
+def test_retry_with_timeout():
+    """Verify that timed-out attempts are retried, and abandoned threads are reported."""
+    attempts = []
+
+    @retry_with_timeout(tries=3, delay=0.01, timeout=0.2)
+    def slow_then_fast():
+        attempts.append(1)
+        if len(attempts) == 1:
+            time.sleep(0.5)
+        return len(attempts)
+
+    before = retry_stats()
+    assert slow_then_fast() == 2
+    after = retry_stats()
+    assert after['timeouts'] - before['timeouts'] == 1
+    assert after['abandoned'] - before['abandoned'] == 1
+
+
+def test_retry_after():
+    """Verify that HTTP 429 responses wait for `Retry-After` seconds, rather than the backoff delay."""
+    attempts = []
+
+    class Throttled(Exception):
+        response = SimpleNamespace(status_code=429, headers={'Retry-After': '0.3'})
+
+    @retry_with_timeout(tries=2, delay=0, timeout=5)
+    def throttled_once():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise Throttled()
+        return 'ok'
+
+    start_time = time.monotonic()
+    assert throttled_once() == 'ok'
+    assert time.monotonic() - start_time >= 0.3
+
+
+def test_timeout_excludes_queue_and_prepare():
+    """Verify that neither queueing for an executor thread, nor `prepare`, counts toward the timeout."""
+    import rcm.utils.retry_utils as retry_utils
+    from rcm.utils.thread_utils import thread_map
+
+    @retry_with_timeout(tries=1, delay=0, timeout=0.3, prepare=lambda x: time.sleep(0.4))
+    def sleep(x):
+        time.sleep(0.2)
+        return x
+
+    # Twice as many callers as executor threads, each waiting longer than the timeout in `prepare`.
+    before = retry_stats()
+    assert thread_map(sleep, range(2 * retry_utils.max_workers), workers=2 * retry_utils.max_workers) == list(range(2 * retry_utils.max_workers))
+    assert retry_stats()['timeouts'] == before['timeouts']